@@ -0,0 +1,320 @@
+import argparse
+import csv
+import json
+import os
+import time
+import typing
+from concurrent import futures
+
+import numpy as np
+
+from divconq import IntelDevice
+
+
+def naive_linear_scan(grid, value):
+    num_cells_searched = 0
+    for y, row in enumerate(grid):
+        for x, cell_value in enumerate(row):
+            num_cells_searched += 1
+            if cell_value == value:
+                return num_cells_searched
+    return num_cells_searched
+
+
+def numpy_linear_scan(grid, value):
+    # vectorised version of naive_linear_scan: compare all cells at once and take the first match
+    cells = np.asarray(grid).reshape(-1)
+    matches = np.flatnonzero(cells == value)
+    return int(matches[0]) + 1 if len(matches) else cells.size
+
+
+def numpy_batch_scan(grid, values, chunk_size: int = 256):
+    """
+    Brute-force baseline for many values at once: every chunk of values is compared against all cells with one
+    broadcast comparison and the first match per value is found with argmax.
+
+    :param grid: The grid that is searched
+    :param values: The values that we are searching for
+    :param chunk_size: The number of values that is compared at once (bounds the (chunk, cells) boolean matrix)
+
+    Returns:
+      A list with the number of cells searched per value (like naive_linear_scan)
+    """
+
+    cells = np.asarray(grid).reshape(-1)
+    values = np.asarray(values)
+    searched = []
+    for start in range(0, len(values), chunk_size):
+        matches = cells[None, :] == values[start:start + chunk_size, None]
+        first = np.argmax(matches, axis=1)
+        found = matches[np.arange(len(first)), first]
+        searched.extend(np.where(found, first + 1, cells.size).tolist())
+    return searched
+
+
+def generate_sorted_grid(rows: int, cols: int, duplicate_density: float = 0.0,
+                         rng: np.random.Generator = None) -> np.ndarray:
+    """
+    Generates a random grid that is sorted along its rows and columns (like IntelDevice.loc_grid).
+
+    :param rows: The number of rows of the grid
+    :param cols: The number of columns of the grid
+    :param duplicate_density: The fraction of steps between neighbouring cells that is zero, which creates duplicate codes
+    :param rng: The random generator to use
+
+    Returns:
+      The (rows, cols) integer grid
+    """
+
+    rng = rng if rng is not None else np.random.default_rng()
+    steps = rng.integers(1, 4, size=(rows, cols))
+    steps[rng.random((rows, cols)) < duplicate_density] = 0
+    return np.cumsum(np.cumsum(steps, axis=0), axis=1)
+
+
+def generate_queries(grid: np.ndarray, distribution: str, num_queries: int,
+                     rng: np.random.Generator = None) -> np.ndarray:
+    """
+    Generates search values for a grid.
+
+    :param grid: The grid that is searched
+    :param distribution: "hits" (uniformly drawn codes of the grid), "misses" (values that do not occur in the grid)
+                         or "skewed" (codes of the grid drawn from a Zipf distribution, so a few codes are asked often)
+    :param num_queries: The number of values to generate
+    :param rng: The random generator to use
+
+    Returns:
+      An array with num_queries search values
+    """
+
+    rng = rng if rng is not None else np.random.default_rng()
+    codes = np.unique(grid)
+    if distribution == "hits":
+        return rng.choice(codes, size=num_queries)
+    if distribution == "misses":
+        candidates = np.setdiff1d(np.arange(codes[0] - 1, codes[-1] + 2), codes)
+        return rng.choice(candidates, size=num_queries)
+    if distribution == "skewed":
+        ranks = np.minimum(rng.zipf(1.5, size=num_queries), len(codes)) - 1
+        return rng.permutation(codes)[ranks]
+    raise ValueError(f"unknown query distribution {distribution!r}, expected one of {DISTRIBUTIONS}")
+
+
+def make_device(grid: np.ndarray) -> IntelDevice:
+    """
+    Returns an IntelDevice that searches the given grid (without location names and without the result cache).
+    """
+
+    rows, cols = grid.shape
+    device = IntelDevice(cols, rows, [], [], 0, cache_size=0)
+    device.loc_grid = grid
+    return device
+
+
+# the number of bands (and worker processes) of the parallel search engine
+PARALLEL_WORKERS = max(2, os.cpu_count() or 1)
+
+# every search engine takes (device, value, pool) and returns the number of cells it probed for that value, or None
+# if it cannot count them (the IntelDevice searches only count cells while the instrumentation is enabled, and not in
+# worker processes). pool is the process pool of the run, shared by all parallel searches
+ENGINES = {
+    "divconq": lambda device, value, pool: _probed_cells(device, lambda: device.divconq_search(
+        value, 0, device.loc_grid.shape[1] - 1, 0, device.loc_grid.shape[0] - 1)),
+    "iterative": lambda device, value, pool: _probed_cells(device, lambda: device.iterative_search(value)),
+    # min_cells=0 and at least two bands so that the small benchmark grids are really searched in parallel
+    "parallel": lambda device, value, pool: _no_cell_count(device.parallel_search(
+        value, pool=pool, workers=PARALLEL_WORKERS, min_cells=0)),
+    "naive_linear_scan": lambda device, value, pool: naive_linear_scan(device.loc_grid, value),
+    "numpy_linear_scan": lambda device, value, pool: numpy_linear_scan(device.loc_grid, value),
+}
+
+# every batch engine takes (device, values) for all queries of a run at once and returns the cells probed per value
+# (None for IntelDevice.batch_search, which does not count its cells)
+BATCH_ENGINES = {
+    "batch_search": lambda device, values: [_no_cell_count(result) for result in device.batch_search(values)],
+    "numpy_batch_scan": lambda device, values: numpy_batch_scan(device.loc_grid, values),
+}
+
+DISTRIBUTIONS = ("hits", "misses", "skewed")
+
+
+def _no_cell_count(result: typing.Any) -> None:
+    return None
+
+
+def _probed_cells(device: IntelDevice, search: typing.Callable[[], typing.Any]) -> int:
+    if device.stats is None:
+        search()
+        return 0
+    before = device.stats.cells_probed
+    search()
+    return device.stats.cells_probed - before
+
+
+def run_benchmark(shapes: typing.List[typing.Tuple[int, int]], engines: typing.List[str] = None,
+                  distributions: typing.List[str] = DISTRIBUTIONS, duplicate_density: float = 0.0,
+                  num_queries: int = 100, repeats: int = 5, seed: int = 0) -> typing.List[typing.Dict]:
+    """
+    Runs every engine on every grid shape and query distribution. The timings are repeated and the median (and
+    minimum) time per query is reported; the probed cells are counted in a separate, instrumented run so that the
+    instrumentation does not influence the timings (mean_cells_probed is None for engines that do not count them).
+    The parallel searches of the whole run share one process pool.
+
+    :param shapes: The (rows, cols) shapes of the generated grids
+    :param engines: The names of the engines (keys of ENGINES or BATCH_ENGINES) to run, all by default
+    :param distributions: The query distributions (see generate_queries) to run
+    :param duplicate_density: See generate_sorted_grid
+    :param num_queries: The number of queries per run
+    :param repeats: The number of timed runs
+    :param seed: The seed of the random generator
+
+    Returns:
+      A list of result rows (dictionaries)
+    """
+
+    engines = engines or list(ENGINES) + list(BATCH_ENGINES)
+    rng = np.random.default_rng(seed)
+    pool = futures.ProcessPoolExecutor(PARALLEL_WORKERS) if "parallel" in engines else None
+    results = []
+    try:
+        for rows, cols in shapes:
+            grid = generate_sorted_grid(rows, cols, duplicate_density, rng)
+            with make_device(grid) as device:
+                for distribution in distributions:
+                    queries = [int(value) for value in generate_queries(grid, distribution, num_queries, rng)]
+                    for engine in engines:
+                        results.append(_run_engine(device, engine, queries, pool, repeats, distribution,
+                                                   duplicate_density))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return results
+
+
+def _run_engine(device: IntelDevice, engine: str, queries: typing.List[int], pool: typing.Optional[futures.Executor],
+                repeats: int, distribution: str, duplicate_density: float) -> typing.Dict:
+    if engine in BATCH_ENGINES:
+        run = lambda: BATCH_ENGINES[engine](device, queries)
+    else:
+        run = lambda: [ENGINES[engine](device, value, pool) for value in queries]
+
+    device.enable_stats()
+    cells = run()
+    device.disable_stats()
+
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - start_time) / len(queries))
+
+    rows, cols = device.loc_grid.shape
+    return {
+        "engine": engine, "distribution": distribution, "rows": rows, "cols": cols,
+        "cells": rows * cols, "duplicate_density": duplicate_density, "queries": len(queries),
+        "repeats": repeats, "median_time": float(np.median(times)), "min_time": float(np.min(times)),
+        "mean_cells_probed": None if None in cells else float(np.mean(cells)),
+    }
+
+
+def fit_growth_exponents(results: typing.List[typing.Dict], metric: str = "median_time") -> typing.List[typing.Dict]:
+    """
+    Fits metric ~ c * cells^k for every (engine, distribution) pair with a least-squares line in log-log space.
+    For a square n x n grid, the naive scan should give k close to 1 (linear in the number of cells).
+
+    Returns:
+      A list of dictionaries with the engine, distribution and fitted exponent
+    """
+
+    exponents = []
+    groups = {}
+    for row in results:
+        groups.setdefault((row["engine"], row["distribution"]), []).append(row)
+    for (engine, distribution), rows in groups.items():
+        cells = np.array([row["cells"] for row in rows], dtype=float)
+        values = np.array([np.nan if row[metric] is None else row[metric] for row in rows], dtype=float)
+        usable = values > 0
+        if len(np.unique(cells[usable])) < 2:
+            continue
+        exponent = np.polyfit(np.log(cells[usable]), np.log(values[usable]), 1)[0]
+        exponents.append({"engine": engine, "distribution": distribution, "metric": metric,
+                          "exponent": float(exponent)})
+    return exponents
+
+
+def write_csv(path: str, results: typing.List[typing.Dict]):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def plot_results(path: str, results: typing.List[typing.Dict]):
+    # matplotlib is only needed for plotting
+    import matplotlib.pyplot as plt
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(10, 4))
+    groups = {}
+    for row in results:
+        groups.setdefault((row["engine"], row["distribution"]), []).append(row)
+    for (engine, distribution), rows in groups.items():
+        rows = sorted(rows, key=lambda row: row["cells"])
+        label = f"{engine} ({distribution})"
+        counted = [row for row in rows if row["mean_cells_probed"] is not None]
+        if counted:
+            ax1.plot([row["cells"] for row in counted], [row["mean_cells_probed"] for row in counted], marker='o',
+                     label=label)
+        ax2.plot([row["cells"] for row in rows], [row["median_time"] for row in rows], marker='o', label=label)
+
+    for ax, ylabel in ((ax1, 'Cells Searched'), (ax2, 'Time per query (s)')):
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+        ax.set_xlabel('Grid Size (cells)')
+        ax.set_ylabel(ylabel)
+    ax2.legend(fontsize='small')
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def parse_shape(text: str) -> typing.Tuple[int, int]:
+    rows, cols = text.lower().split("x")
+    return int(rows), int(cols)
+
+
+def main(argv: typing.List[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the IntelDevice search modes against a naive linear scan")
+    parser.add_argument("--shapes", type=parse_shape, nargs="+", default=[(n, n) for n in (16, 32, 64, 128)],
+                        help="grid shapes as ROWSxCOLS")
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES) + list(BATCH_ENGINES), default=None)
+    parser.add_argument("--distributions", nargs="+", choices=DISTRIBUTIONS, default=list(DISTRIBUTIONS))
+    parser.add_argument("--duplicates", type=float, default=0.0, help="duplicate density of the generated grids")
+    parser.add_argument("--queries", type=int, default=50, help="number of queries per run")
+    parser.add_argument("--repeats", type=int, default=3, help="number of timed runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this JSON file")
+    parser.add_argument("--csv", help="write the results to this CSV file")
+    parser.add_argument("--plot", help="write a plot of the results to this image file (needs matplotlib)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.shapes, args.engines, args.distributions, args.duplicates,
+                            args.queries, args.repeats, args.seed)
+    exponents = fit_growth_exponents(results) + fit_growth_exponents(results, "mean_cells_probed")
+
+    for row in results:
+        print(f"{row['engine']:>18} {row['distribution']:>7} {row['rows']:>6}x{row['cols']:<6} "
+              f"{row['median_time'] * 1e6:10.1f} us/query "
+              + (f"{row['mean_cells_probed']:10.1f} cells" if row['mean_cells_probed'] is not None else ""))
+    for row in exponents:
+        print(f"{row['engine']:>18} {row['distribution']:>7} {row['metric']:>17} ~ cells^{row['exponent']:.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"results": results, "exponents": exponents}, f, indent=2)
+    if args.csv:
+        write_csv(args.csv, results)
+    if args.plot:
+        plot_results(args.plot, results)
+
+
+if __name__ == "__main__":
+    main()
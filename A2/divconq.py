@@ -1,8 +1,281 @@
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
 import numpy as np
 import typing
+from collections import OrderedDict
+from collections.abc import MutableMapping, Sequence
+from concurrent import futures
+from multiprocessing import resource_tracker, shared_memory
+
+# grids with fewer cells than this are always searched serially by IntelDevice.parallel_search
+PARALLEL_MIN_CELLS = 1 << 16
+
+# version of the on-disk layout written by IntelDevice.save_snapshot
+SNAPSHOT_VERSION = 1
+
+
+def smallest_int_dtype(low: int, high: int) -> np.dtype:
+    """
+    Returns the smallest signed integer dtype that can hold every value in the range [low, high].
+    Signed types are used so that comparisons against negative search values keep working. The maximum of the
+    type is never used for codes, as it marks empty cells of the grid (see IntelDevice.delete).
+
+    :param low: The smallest value that has to fit
+    :param high: The largest value that has to fit
+    """
+
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= low and high < info.max:
+            return np.dtype(dtype)
+    raise OverflowError(f"codes in the range [{low}, {high}] do not fit in 64 bits")
+
+
+def empty_cell_value(dtype: np.dtype) -> int:
+    """
+    Returns the value that marks an empty cell in a grid of the given integer dtype (the maximum of the type).
+    Empty cells sort after every code, so they keep the rows and columns of the grid sorted.
+    """
+
+    return int(np.iinfo(dtype).max)
+
+
+class LazyLocationMap(MutableMapping):
+    def __init__(self, enc_locations: typing.List[str], width: int, height: int,
+                 decode: typing.Callable[[str], str]):
+        """
+        Mapping from (y,x) tuples to decoded location names. The encoded names are only decoded the first time a
+        coordinate is looked up, after which the result is cached in a flat list indexed by y*width+x. This way the
+        cost of building the mapping grows with the number of queries and not with the size of the grid.
+        The mapping can be changed (set, delete or swap entries) to follow incremental updates of the grid; the list of
+        encoded names is copied on the first change, so the caller's enc_locations list is never modified.
+
+        :param enc_locations: The list of encoded location names (wrapping around the rows of the grid)
+        :param width: The number of columns of the grid
+        :param height: The number of rows of the grid
+        :param decode: The function used to decode a single encoded location name
+        """
+
+        self.enc_locations = enc_locations
+        self.width = width
+        self.height = height
+        self.decode = decode
+        self.copied = False
+
+        # only the coordinates that have an encoded location name are part of the mapping
+        self.size = min(len(enc_locations), width * height)
+        self.cache = [None] * self.size
+
+    def _index(self, key: typing.Tuple[int, int]) -> int:
+        y, x = key
+        if not (0 <= y < self.height and 0 <= x < self.width):
+            raise KeyError(key)
+        return y * self.width + x
+
+    def _exists(self, idx: int) -> bool:
+        return idx < self.size and (self.cache[idx] is not None or self.enc_locations[idx] is not None)
+
+    def _make_mutable(self, height: int):
+        """
+        Copies the list of encoded names (once) and grows the mapping so that it covers height rows.
+        """
+
+        if not self.copied:
+            self.enc_locations = list(self.enc_locations[:self.size])
+            self.copied = True
+        self.height = max(self.height, height)
+        missing = self.height * self.width - self.size
+        if missing > 0:
+            self.enc_locations.extend([None] * missing)
+            self.cache.extend([None] * missing)
+            self.size += missing
+
+    def __getitem__(self, key: typing.Tuple[int, int]) -> str:
+        idx = self._index(key)
+        if not self._exists(idx):
+            raise KeyError(key)
+
+        # decode the location name on first access and cache it
+        location = self.cache[idx]
+        if location is None:
+            location = self.decode(self.enc_locations[idx])
+            self.cache[idx] = location
+        return location
+
+    def peek(self, key: typing.Tuple[int, int]) -> typing.Optional[str]:
+        """
+        Returns the location name of a coordinate (or None if it has none) without caching the decoded name, so a
+        full pass over the mapping does not keep every name in memory.
+        """
+
+        idx = self._index(key)
+        if not self._exists(idx):
+            return None
+        location = self.cache[idx]
+        return location if location is not None else self.decode(self.enc_locations[idx])
+
+    def __setitem__(self, key: typing.Tuple[int, int], location: str):
+        self._make_mutable(key[0] + 1)
+        idx = self._index(key)
+        self.cache[idx] = location
+        self.enc_locations[idx] = None
+
+    def __delitem__(self, key: typing.Tuple[int, int]):
+        idx = self._index(key)
+        if not self._exists(idx):
+            raise KeyError(key)
+        self._make_mutable(self.height)
+        self.cache[idx] = None
+        self.enc_locations[idx] = None
+
+    def swap(self, key_a: typing.Tuple[int, int], key_b: typing.Tuple[int, int]):
+        """
+        Swaps the location names of two coordinates (either of which may be missing from the mapping),
+        without decoding them.
+        """
+
+        self._make_mutable(max(key_a[0], key_b[0]) + 1)
+        a, b = self._index(key_a), self._index(key_b)
+        self.cache[a], self.cache[b] = self.cache[b], self.cache[a]
+        self.enc_locations[a], self.enc_locations[b] = self.enc_locations[b], self.enc_locations[a]
+
+    def __iter__(self) -> typing.Iterator[typing.Tuple[int, int]]:
+        for idx in range(self.size):
+            if self._exists(idx):
+                yield divmod(idx, self.width)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class StringBlob(Sequence):
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, present: np.ndarray):
+        """
+        Read-only sequence of strings stored back to back in one (memory-mapped) UTF-8 byte blob. String i is
+        blob[offsets[i]:offsets[i+1]] and only decoded when it is accessed; entries for which present[i] is False are None.
+
+        :param blob: The uint8 array with all strings
+        :param offsets: The n+1 start offsets of the strings in blob
+        :param present: Boolean array telling which of the n entries hold a string
+        """
+
+        self.blob = blob
+        self.offsets = offsets
+        self.present = present
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if not self.present[index]:
+            return None
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].tobytes().decode('utf-8')
+
+    def __len__(self) -> int:
+        return len(self.present)
+
+
+class LRUCache:
+    def __init__(self, maxsize: int):
+        """
+        A bounded least-recently-used cache that keeps track of its hit, miss and eviction counts.
+
+        :param maxsize: The maximum number of entries. A maxsize of 0 disables the cache
+        """
+
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for key (marking it as most recently used), or default if key is not cached.
+        """
+
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Stores value for key, evicting the least recently used entry if the cache is full.
+        """
+
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Removes all entries (the counters are kept).
+        """
+
+        self.entries.clear()
+
+    def info(self) -> typing.Dict[str, int]:
+        """
+        Returns the hit, miss and eviction counters and the current and maximum size of the cache.
+        """
+
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "size": len(self.entries), "maxsize": self.maxsize}
+
+
+class SearchStats:
+    def __init__(self):
+        """
+        Counters collected by the IntelDevice searches when the instrumentation is enabled (see IntelDevice.enable_stats).
+        The totals are summed over all queries, and every start_search query also appends its own counts to self.queries.
+        """
+
+        self.cells_probed = 0
+        self.nodes = 0
+        self.max_depth = 0
+        self.pruned = 0
+        self.wall_time = 0.0
+        self.queries = []
+
+    def visit(self, depth: int):
+        """
+        Records a visit of a sub-rectangle at the given recursion depth.
+        """
+
+        self.nodes += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def snapshot(self) -> typing.Dict[str, float]:
+        """
+        Returns the current totals as a dictionary.
+        """
+
+        return {"cells_probed": self.cells_probed, "nodes": self.nodes, "max_depth": self.max_depth,
+                "pruned": self.pruned, "wall_time": self.wall_time}
+
+
+# marks a value that is not in the LRU cache (None is a valid cached search result)
+_NOT_CACHED = object()
+
 
 class IntelDevice:
-    def __init__(self, width:int, height:int, enc_locations: typing.List[str], enc_codes:typing.List[str], caesar_shift: int):
+    def __init__(self, width:int, height:int, enc_locations: typing.List[str], enc_codes:typing.List[str], caesar_shift: int,
+                 cache_size: int = 1024):
         """
         The IntelDevice object, containing all information and functions required for encoding and decoding messages,
         processing raw encoded locations, efficiently searching for locations based on codes and returning encoded
@@ -14,6 +287,7 @@ class IntelDevice:
         :param enc_codes: A list of encoded codes (ints) that have to be entered into self.loc_grid
         :param caesar_shift: The caesar shift constant used to encode messages. You may assume this will always be in the set 
                              {0,1,...,26}. We do NOT use modulo calculations for our caesar cipher. 
+        :param cache_size: The maximum number of search results that start_search keeps in its LRU cache (0 disables it)
 
         You do not need to change this function
         """
@@ -27,6 +301,15 @@ class IntelDevice:
         self.loc_grid = np.zeros((height, width))
         self.coordinate_to_location = dict() # maps locations (y,x) to their names
 
+        # maps searched values to their encoded locations, cleared whenever the grid or the locations are (re)filled
+        self.search_cache = LRUCache(cache_size)
+
+        # search instrumentation, None when disabled (see self.enable_stats())
+        self.stats = None
+
+        # the process pool of self.parallel_search(), created on first use (see self.search_pool())
+        self._search_pool = None
+
 
     def encode_message(self, msg:str) -> str:
         """
@@ -98,16 +381,17 @@ class IntelDevice:
           (1,1) -> 'd'
 
         The function does not return anything. It simply fills the self.coordinate_to_location data structure with the right mapping.
+        The names are only decoded once a coordinate is actually looked up.
         """
 
-        # Iterate over every coordinate in the loc_grid
-        for y in range(self.loc_grid.shape[0]):
-            for x in range(self.loc_grid.shape[1]):
-                # Calculate the index of the corresponding encoded location in self.enc_locations
-                idx = y * self.loc_grid.shape[1] + x
+        self.search_cache.clear()
 
-                # Decode the encoded location and add it to the coordinate_to_location mapping
-                self.coordinate_to_location[(y, x)] = self.decode_message(self.enc_locations[idx])
+        # The locations are decoded lazily (on first lookup) instead of all at once, see LazyLocationMap.
+        # Like the codes in self.fill_loc_grid, locations that do not fit in the grid wrap around into extra rows
+        rows, cols = self.loc_grid.shape
+        rows = max(rows, -(-len(self.enc_locations) // cols)) if cols else rows
+        self.coordinate_to_location = LazyLocationMap(self.enc_locations, width=cols, height=rows,
+                                                      decode=self.decode_message)
 
 
     def fill_loc_grid(self):
@@ -121,30 +405,413 @@ class IntelDevice:
            [11,16]]
 
         The function does not return anything. It simply fills the self.loc_grid data structure with the decoded codes.
+        Cells without a code (when there are fewer codes than cells, e.g. a partially filled last row) are marked as
+        empty (see empty_cell_value), which keeps the grid sorted; the searches never report empty cells as a match.
         """
-        # Calculate number of rows and columns in loc_grid
-        rows = self.height
+        self.search_cache.clear()
+
+        # Calculate number of rows and columns in loc_grid. If there are more codes than fit in the grid,
+        # the grid gets as many extra rows as needed (the last row may be partially filled)
         cols = self.width
+        num_codes = len(self.enc_codes)
+        rows = max(self.height, -(-num_codes // cols))
+
+        # Decode all codes first (straight into an int64 array, not a list of Python ints), so that we know which
+        # values have to fit in the grid
+        codes = np.fromiter((int(self.decode_message(code)) for code in self.enc_codes), dtype=np.int64,
+                            count=num_codes)
+
+        # Initialize loc_grid with empty cells (the maximum of the smallest integer type that fits all codes),
+        # which sort after every code so that the rows and columns of a partially filled grid remain sorted
+        dtype = smallest_int_dtype(int(codes.min(initial=0)), int(codes.max(initial=0)))
+        self.loc_grid = np.full((rows, cols), empty_cell_value(dtype), dtype=dtype)
 
-        # If there are extra codes that don't fit in the last row, add another row
-        if len(self.enc_codes) % cols != 0:
-            rows += 1
+        # Fill in loc_grid with decoded codes (wrapping around the rows)
+        self.loc_grid.reshape(-1)[:num_codes] = codes
 
-        # Initialize loc_grid with zeros
-        self.loc_grid = np.zeros((rows, cols), dtype=int)
 
-        # Fill in loc_grid with decoded codes
-        for i in range(rows):
-            for j in range(cols):
-                index = i * cols + j
-                # If we have already used up all the codes, break out of the loop
-                if index >= len(self.enc_codes):
+    def fill_loc_grid_from(self, source: typing.Union[str, os.PathLike, typing.Iterable[str]], chunk_rows: int = 64):
+        """
+        Streaming version of self.fill_loc_grid(). Instead of a fully materialised self.enc_codes list, the encoded
+        codes are read from an iterator (or from a file with one encoded code per line) and decoded in chunks of
+        chunk_rows rows straight into the preallocated self.loc_grid. The peak memory is thus the grid plus one chunk.
+        Like self.fill_loc_grid(), the codes wrap around the rows, codes that do not fit in the grid are put in extra
+        rows and cells without a code are marked as empty. The grid starts with the smallest integer type and is only
+        widened when a chunk contains a code that does not fit.
+
+        :param source: An iterable of encoded codes or the path of a file containing one encoded code per line
+        :param chunk_rows: The number of grid rows that are decoded at once
+        """
+
+        if isinstance(source, (str, os.PathLike)):
+            with open(source) as f:
+                self._stream_codes_into_grid((line.strip() for line in f if line.strip()), chunk_rows)
+        else:
+            self._stream_codes_into_grid(iter(source), chunk_rows)
+
+
+    def _stream_codes_into_grid(self, codes: typing.Iterator[str], chunk_rows: int):
+        """
+        Decodes the codes from the iterator in chunks into a newly allocated self.loc_grid (see self.fill_loc_grid_from).
+
+        :param codes: An iterator over the encoded codes
+        :param chunk_rows: The number of grid rows that are decoded at once
+        """
+
+        cols = self.width
+        grid = np.full((self.height, cols), empty_cell_value(np.int8), dtype=np.int8)
+        position = 0
+
+        while True:
+            # If the grid is full but there are more codes, grow the grid by chunk_rows rows
+            if position == grid.size:
+                first = next(codes, None)
+                if first is None:
                     break
-                # Decode the code and add it to loc_grid
-                self.loc_grid[i][j] = int(self.decode_message(self.enc_codes[index]))
+                extra_rows = np.full((chunk_rows, cols), empty_cell_value(grid.dtype), dtype=grid.dtype)
+                grid = np.vstack([grid, extra_rows])
+                codes = itertools.chain([first], codes)
+
+            chunk_size = min(chunk_rows * cols, grid.size - position)
+            chunk = [int(self.decode_message(code)) for code in itertools.islice(codes, chunk_size)]
+            if not chunk:
+                break
+
+            # Widen the grid if this chunk contains codes that do not fit in the current integer type
+            # (the cells that have not been filled yet are re-marked as empty for the new type)
+            dtype = np.promote_types(grid.dtype, smallest_int_dtype(min(chunk), max(chunk)))
+            if dtype != grid.dtype:
+                grid = grid.astype(dtype)
+                grid.reshape(-1)[position:] = empty_cell_value(dtype)
+
+            grid.reshape(-1)[position:position + len(chunk)] = chunk
+            position += len(chunk)
+
+        # drop the rows that were added while growing but did not receive any code
+        self.loc_grid = grid[:max(self.height, -(-position // cols))]
+        self.search_cache.clear()
+
+
+    def save_loc_grid(self, path: str):
+        """
+        Saves the (decoded) self.loc_grid to a .npy file, so that it can be loaded again with self.load_loc_grid()
+        without decoding self.enc_codes again.
+
+        :param path: The path of the .npy file
+        """
+
+        np.save(path, self.loc_grid)
+
+
+    def load_loc_grid(self, path: str, mmap: bool = True):
+        """
+        Loads self.loc_grid from a .npy file written by self.save_loc_grid(). By default the file is memory-mapped
+        read-only, so that multiple worker processes can share one on-disk grid instead of each holding a private copy.
+
+        :param path: The path of the .npy file
+        :param mmap: Whether to memory-map the file (True) or read it into memory (False)
+        """
+
+        self.loc_grid = np.load(path, mmap_mode='r' if mmap else None)
+        self.search_cache.clear()
+
+
+    def save_snapshot(self, directory: str, overwrite: bool = False):
+        """
+        Saves a versioned snapshot of the fully built device, from which self.load_snapshot() can restore it without
+        decoding self.enc_codes and self.enc_locations again. The snapshot directory contains:
+          - meta.json: the snapshot version, the caesar shift and the shape and dtype of the grid
+          - grid.npy: the decoded self.loc_grid
+          - locations.bin: all decoded location names as one UTF-8 blob
+          - locations_offsets.npy, locations_present.npy: the start offsets of the names in the blob and which
+            coordinates (in row-major order) have a name
+
+        :param directory: The directory to write the snapshot to. It is created if needed; an existing directory is
+                          only replaced if it is empty or holds a snapshot, unless overwrite is set
+        :param overwrite: Whether to replace the existing directory whatever it contains
+        """
+
+        if os.path.lexists(directory) and not overwrite and not _is_replaceable_snapshot_directory(directory):
+            raise FileExistsError(f"{directory} exists and is not a snapshot, pass overwrite=True to replace it")
+
+        # the snapshot is written to a temporary directory next to the target, which is only moved into place once it
+        # is complete: an interrupted save never leaves a mix of old and new files, and the old snapshot survives it
+        directory = os.path.abspath(directory)
+        parent = os.path.dirname(directory)
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".{os.path.basename(directory)}.", dir=parent)
+        try:
+            self._write_snapshot(staging)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if os.path.exists(directory):
+            previous = staging + ".old"
+            os.replace(directory, previous)
+            os.replace(staging, directory)
+            shutil.rmtree(previous, ignore_errors=True)
+        else:
+            os.replace(staging, directory)
+
+
+    def _write_snapshot(self, directory: str):
+        """
+        Writes the files of self.save_snapshot() into the (existing) directory.
+        """
+
+        rows, cols = self.loc_grid.shape
+
+        # the location mapping may cover more rows than the grid (see self.fill_coordinate_to_loc)
+        locations = self.coordinate_to_location
+        if isinstance(locations, LazyLocationMap):
+            num_locations = locations.size
+            lookup = locations.peek
+        else:
+            num_locations = max((y * cols + x + 1 for y, x in locations), default=0)
+            lookup = locations.get
+
+        names = []
+        present = np.zeros(num_locations, dtype=bool)
+        for idx in range(num_locations):
+            name = lookup(divmod(idx, cols)) if cols else None
+            present[idx] = name is not None
+            names.append((name or "").encode('utf-8'))
+
+        offsets = np.zeros(num_locations + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in names], out=offsets[1:])
+
+        with open(os.path.join(directory, "locations.bin"), "wb") as f:
+            f.write(b"".join(names))
+        np.save(os.path.join(directory, "locations_offsets.npy"), offsets)
+        np.save(os.path.join(directory, "locations_present.npy"), present)
+        np.save(os.path.join(directory, "grid.npy"), self.loc_grid)
+
+        # meta.json is written last, so a snapshot without it is incomplete
+        meta = {"version": SNAPSHOT_VERSION, "caesar_shift": self.caesar_shift, "width": self.width,
+                "height": self.height, "shape": [rows, cols], "dtype": self.loc_grid.dtype.str}
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+
+    @classmethod
+    def load_snapshot(cls, directory: str, mmap: bool = True, cache_size: int = 1024) -> "IntelDevice":
+        """
+        Restores a device saved with self.save_snapshot(). With mmap=True, the grid and the location names are
+        memory-mapped read-only, so restoring takes (almost) no time and no decoding; location names are only read
+        from the blob when they are looked up. The restored device has no enc_codes or enc_locations, so the
+        fill_* functions should not be called on it.
+
+        :param directory: The snapshot directory
+        :param mmap: Whether to memory-map the snapshot files (True) or read them into memory (False)
+        :param cache_size: See IntelDevice.__init__
+
+        Returns:
+          The restored IntelDevice
+        """
+
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported snapshot version {meta.get('version')!r}, expected {SNAPSHOT_VERSION}")
+
+        mmap_mode = 'r' if mmap else None
+        device = cls(meta["width"], meta["height"], [], [], meta["caesar_shift"], cache_size=cache_size)
+        device.loc_grid = np.load(os.path.join(directory, "grid.npy"), mmap_mode=mmap_mode)
+
+        offsets = np.load(os.path.join(directory, "locations_offsets.npy"), mmap_mode=mmap_mode)
+        present = np.load(os.path.join(directory, "locations_present.npy"), mmap_mode=mmap_mode)
+        blob_path = os.path.join(directory, "locations.bin")
+        if mmap and os.path.getsize(blob_path) > 0:
+            blob = np.memmap(blob_path, dtype=np.uint8, mode='r')
+        else:
+            blob = np.fromfile(blob_path, dtype=np.uint8)
+
+        # the names in the blob are already decoded
+        rows, cols = device.loc_grid.shape
+        rows = max(rows, -(-len(present) // cols)) if cols else rows
+        device.coordinate_to_location = LazyLocationMap(StringBlob(blob, offsets, present), width=cols, height=rows,
+                                                        decode=lambda name: name)
+        return device
+
+
+    def _is_empty_value(self, value: int) -> bool:
+        """
+        Returns whether value can only match empty cells of self.loc_grid (see empty_cell_value), in which case
+        the searches return None without searching.
+        """
+
+        return self.loc_grid.dtype.kind == 'i' and value >= empty_cell_value(self.loc_grid.dtype)
+
+
+    def _prepare_update(self, value: int = None):
+        """
+        Makes self.loc_grid ready for an in-place update: the grid is converted to a writable integer grid (a read-only
+        memory-mapped grid is copied into memory) and widened if value does not fit below the empty-cell marker.
+        Since the codes can move, the search cache and a shared memory copy of the grid are invalidated.
+        """
+
+        grid = self.loc_grid
+        if grid.dtype.kind != 'i':
+            grid = grid.astype(smallest_int_dtype(int(grid.min(initial=0)), int(grid.max(initial=0))))
+
+        if value is not None:
+            dtype = np.promote_types(grid.dtype, smallest_int_dtype(value, value))
+            if dtype != grid.dtype:
+                empty = grid == empty_cell_value(grid.dtype)
+                grid = grid.astype(dtype)
+                grid[empty] = empty_cell_value(dtype)
+
+        if not grid.flags.writeable:
+            grid = np.array(grid)
+
+        self.loc_grid = grid
+        self.search_cache.clear()
+        self.release_shared_loc_grid()
+
+
+    def _normalize_cell(self, y: int, x: int) -> typing.Tuple[int, int]:
+        """
+        Checks the coordinates of a cell of self.loc_grid before it is changed. Like NumPy, negative coordinates count
+        from the end; coordinates outside of the grid raise an IndexError.
+        """
+
+        rows, cols = self.loc_grid.shape
+        if not (-rows <= y < rows and -cols <= x < cols):
+            raise IndexError(f"cell {(y, x)} is outside of the {rows}x{cols} grid")
+        return int(y) % rows, int(x) % cols
+
+
+    def _swap_cells(self, a: typing.Tuple[int, int], b: typing.Tuple[int, int]):
+        """
+        Swaps two cells of self.loc_grid together with their location names.
+        """
+
+        self.loc_grid[a], self.loc_grid[b] = self.loc_grid[b], self.loc_grid[a]
+
+        locations = self.coordinate_to_location
+        if isinstance(locations, LazyLocationMap):
+            locations.swap(a, b)
+        else:
+            location_a = locations.pop(a, None)
+            location_b = locations.pop(b, None)
+            if location_a is not None:
+                locations[b] = location_a
+            if location_b is not None:
+                locations[a] = location_b
+
+
+    def _sift_up(self, y: int, x: int) -> typing.Tuple[int, int]:
+        """
+        Moves the cell (y,x) up/left (Young tableau style) until its top and left neighbours are not larger.
+
+        Returns:
+          The final (y,x) position of the cell
+        """
+
+        grid = self.loc_grid
+        while True:
+            # pick the larger of the top and left neighbours
+            y_next, x_next = y, x
+            if y > 0 and grid[y - 1, x] > grid[y_next, x_next]:
+                y_next, x_next = y - 1, x
+            if x > 0 and grid[y, x - 1] > grid[y_next, x_next]:
+                y_next, x_next = y, x - 1
+            if (y_next, x_next) == (y, x):
+                return (y, x)
+            self._swap_cells((y, x), (y_next, x_next))
+            y, x = y_next, x_next
+
+
+    def _sift_down(self, y: int, x: int) -> typing.Tuple[int, int]:
+        """
+        Moves the cell (y,x) down/right (Young tableau style) until its bottom and right neighbours are not smaller.
+
+        Returns:
+          The final (y,x) position of the cell
+        """
+
+        grid = self.loc_grid
+        rows, cols = grid.shape
+        while True:
+            # pick the smaller of the bottom and right neighbours
+            y_next, x_next = y, x
+            if y + 1 < rows and grid[y + 1, x] < grid[y_next, x_next]:
+                y_next, x_next = y + 1, x
+            if x + 1 < cols and grid[y, x + 1] < grid[y_next, x_next]:
+                y_next, x_next = y, x + 1
+            if (y_next, x_next) == (y, x):
+                return (y, x)
+            self._swap_cells((y, x), (y_next, x_next))
+            y, x = y_next, x_next
+
+
+    def update(self, y: int, x: int, value: int) -> typing.Tuple[int, int]:
+        """
+        Changes the code of cell (y,x) to value without rebuilding the grid. The cell (and its location name) is moved
+        up/left or down/right until the rows and columns of self.loc_grid are sorted again, which takes O(h + w) swaps.
+
+        :param y: The row of the cell (negative rows count from the bottom)
+        :param x: The column of the cell (negative columns count from the right)
+        :param value: The new code of the cell
+
+        Returns:
+          The (y,x) position at which the cell ended up
+        """
+
+        y, x = self._normalize_cell(y, x)
+        self._prepare_update(value)
+        old_value = self.loc_grid[y, x]
+        if old_value == empty_cell_value(self.loc_grid.dtype):
+            raise ValueError(f"cell {(y, x)} is empty, use insert() to add a code")
+
+        self.loc_grid[y, x] = value
+        if value < old_value:
+            return self._sift_up(y, x)
+        return self._sift_down(y, x)
+
+
+    def insert(self, value: int, location: str) -> typing.Tuple[int, int]:
+        """
+        Inserts a new code with its (decoded) location name in an empty cell of the grid (see self.delete()). As empty
+        cells sort after every code, the bottom-right cell is empty if the grid has an empty cell at all. The code is
+        placed there and moved up/left until the grid is sorted again.
+
+        :param value: The code to insert
+        :param location: The decoded location name that belongs to the code
+
+        Returns:
+          The (y,x) position at which the code ended up
+        """
+
+        self._prepare_update(value)
+        rows, cols = self.loc_grid.shape
+        if rows == 0 or cols == 0 or self.loc_grid[rows - 1, cols - 1] != empty_cell_value(self.loc_grid.dtype):
+            raise ValueError("the grid has no empty cell left to insert into")
+
+        self.loc_grid[rows - 1, cols - 1] = value
+        self.coordinate_to_location[(rows - 1, cols - 1)] = location
+        return self._sift_up(rows - 1, cols - 1)
+
+
+    def delete(self, y: int, x: int):
+        """
+        Deletes the code (and location name) of cell (y,x). The cell is marked as empty with the maximum value of the
+        grid's integer type and moved down/right, so the rows and columns of self.loc_grid stay sorted.
+
+        :param y: The row of the cell (negative rows count from the bottom)
+        :param x: The column of the cell (negative columns count from the right)
+        """
+
+        y, x = self._normalize_cell(y, x)
+        self._prepare_update()
+        self.loc_grid[y, x] = empty_cell_value(self.loc_grid.dtype)
+        self.coordinate_to_location.pop((y, x), None)
+        self._sift_down(y, x)
 
 
-    def divconq_search(self, value: int, x_from: int, x_to: int, y_from: int, y_to: int) -> typing.Tuple[int, int]:
+    def divconq_search(self, value: int, x_from: int, x_to: int, y_from: int, y_to: int,
+                       depth: int = 0, stop: typing.Optional[typing.Callable[[], bool]] = None) -> typing.Tuple[int, int]:
         """
         The divide and conquer search function. The function searches for value in a subset of self.loc_grid.
         More specifically, we only search in the x-region from x_from up to (and including) x_from and the y-region
@@ -162,6 +829,9 @@ class IntelDevice:
         :param x_to: The rightmost x coordinate of the subrectangle we are searching over
         :param y_from: The topmost y coordinate of the subrectangle we are searching over
         :param y_to: The bottom y coordinate of the subrectangle we are searching over
+        :param depth: The recursion depth of this call (only used for the instrumentation, see self.enable_stats())
+        :param stop: Optional function that tells whether the search should be abandoned (checked for every
+                     sub-rectangle; used by self.parallel_search() to stop the other bands after a hit)
 
         Note that the following two constraints hold:
           1. x_from <= x_to
@@ -175,9 +845,17 @@ class IntelDevice:
         # Check if the search range is valid
         if x_from > x_to or y_from > y_to:
             return None
+        if stop is not None and stop():
+            return None
+
+        stats = self.stats
+        if stats is not None:
+            stats.visit(depth)
 
         # if there is one cell, check if that value is the value being searched for
         if x_from == x_to and y_from == y_to:
+            if stats is not None:
+                stats.cells_probed += 1
             if self.loc_grid[y_from][x_from] == value:
                 return (y_from, x_from)
             else:
@@ -188,38 +866,44 @@ class IntelDevice:
 
         # Check if the middle element matches the search value
         mid_val = self.loc_grid[mid_y][mid_x]
+        if stats is not None:
+            stats.cells_probed += 1
         if mid_val == value:
             return (mid_y, mid_x)
 
+        # one of the four quadrants can always be skipped
+        if stats is not None:
+            stats.pruned += 1
+
         if mid_val > value:
             # Recursively search the top-left quadrant
-            top_left = self.divconq_search(value, x_from, mid_x, y_from, mid_y)
+            top_left = self.divconq_search(value, x_from, mid_x, y_from, mid_y, depth + 1, stop)
             if top_left is not None:
                 return top_left
 
             # Recursively search the top-right quadrant
-            top_right = self.divconq_search(value, mid_x + 1, x_to, y_from, mid_y)
+            top_right = self.divconq_search(value, mid_x + 1, x_to, y_from, mid_y, depth + 1, stop)
             if top_right is not None:
                 return top_right
 
             # Recursively search the bottom-left quadrant
-            bottom_left = self.divconq_search(value, x_from, mid_x, mid_y + 1, y_to)
+            bottom_left = self.divconq_search(value, x_from, mid_x, mid_y + 1, y_to, depth + 1, stop)
             if bottom_left is not None:
                 return bottom_left
 
         else:
             # Recursively search the top-right quadrant
-            top_right = self.divconq_search(value, mid_x + 1, x_to, y_from, mid_y)
+            top_right = self.divconq_search(value, mid_x + 1, x_to, y_from, mid_y, depth + 1, stop)
             if top_right is not None:
                 return top_right
 
             # Recursively search the bottom-left quadrant
-            bottom_left = self.divconq_search(value, x_from, mid_x, mid_y + 1, y_to)
+            bottom_left = self.divconq_search(value, x_from, mid_x, mid_y + 1, y_to, depth + 1, stop)
             if bottom_left is not None:
                 return bottom_left
 
             # Check if the search value is in the bottom-right quadrant
-            bottom_right = self.divconq_search(value, mid_x + 1, x_to, mid_y + 1, y_to)
+            bottom_right = self.divconq_search(value, mid_x + 1, x_to, mid_y + 1, y_to, depth + 1, stop)
             if bottom_right is not None:
                 return bottom_right
 
@@ -227,13 +911,395 @@ class IntelDevice:
         return None
 
 
-    def start_search(self, value) -> str:
+    def iterative_search(self, value: int) -> typing.Optional[typing.Tuple[int, int]]:
+        """
+        Iterative version of self.divconq_search() that uses an explicit stack instead of recursion. Before a
+        sub-rectangle is visited, it is pruned using its corners: as the grid is sorted along the rows and columns, the
+        top-left cell is the minimum and the bottom-right cell the maximum of the sub-rectangle, so the value cannot
+        occur in it if it is smaller than the former or larger than the latter. The cells are read through a flat
+        memoryview of the grid, which avoids creating a NumPy scalar for every probed cell.
+
+        :param value: The value that we are searching for in self.loc_grid
+
+        Returns:
+          None if the value does not occur in self.loc_grid
+          A tuple (y,x) specifying the location where the value was found
+        """
+
+        rows, cols = self.loc_grid.shape
+        if rows == 0 or cols == 0:
+            return None
+        if self._is_empty_value(value):
+            return None
+        cells = memoryview(np.ascontiguousarray(self.loc_grid)).cast('B').cast(self.loc_grid.dtype.char)
+
+        stats = self.stats
+        stack = [(0, cols - 1, 0, rows - 1, 0)]
+        while stack:
+            x_from, x_to, y_from, y_to, depth = stack.pop()
+            if stats is not None:
+                stats.visit(depth)
+                stats.cells_probed += 2
+
+            # prune the sub-rectangle if the value is outside of its [top-left, bottom-right] range
+            if value < cells[y_from * cols + x_from] or value > cells[y_to * cols + x_to]:
+                if stats is not None:
+                    stats.pruned += 1
+                continue
+
+            mid_x = (x_from + x_to) // 2
+            mid_y = (y_from + y_to) // 2
+            mid_val = cells[mid_y * cols + mid_x]
+            if stats is not None:
+                stats.cells_probed += 1
+                stats.pruned += 1
+            if mid_val == value:
+                return (mid_y, mid_x)
+
+            # push the quadrants in reverse order, so they are visited in the same order as in self.divconq_search()
+            depth += 1
+            if mid_val > value:
+                # the value cannot be in the bottom-right quadrant
+                if mid_y < y_to:
+                    stack.append((x_from, mid_x, mid_y + 1, y_to, depth))
+                if mid_x < x_to:
+                    stack.append((mid_x + 1, x_to, y_from, mid_y, depth))
+                stack.append((x_from, mid_x, y_from, mid_y, depth))
+            else:
+                # the value cannot be in the top-left quadrant
+                if mid_x < x_to and mid_y < y_to:
+                    stack.append((mid_x + 1, x_to, mid_y + 1, y_to, depth))
+                if mid_y < y_to:
+                    stack.append((x_from, mid_x, mid_y + 1, y_to, depth))
+                if mid_x < x_to:
+                    stack.append((mid_x + 1, x_to, y_from, mid_y, depth))
+
+        return None
+
+
+    def _row_bounds(self, lo: int, hi: int) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Bisects every row of self.loc_grid (the rows are sorted) for the range [lo, hi].
+
+        Returns:
+          Two arrays starts, ends such that self.loc_grid[y, starts[y]:ends[y]] are exactly the codes in [lo, hi]
+        """
+
+        # empty cells (see empty_cell_value) are never part of a range
+        if self.loc_grid.dtype.kind == 'i':
+            hi = min(hi, empty_cell_value(self.loc_grid.dtype) - 1)
+
+        rows = self.loc_grid.shape[0]
+        starts = np.empty(rows, dtype=np.intp)
+        ends = np.empty(rows, dtype=np.intp)
+        for y in range(rows):
+            row = self.loc_grid[y]
+            starts[y] = np.searchsorted(row, lo, side='left')
+            ends[y] = np.searchsorted(row, hi, side='right')
+        return starts, np.maximum(starts, ends)
+
+
+    def _encoded_locations(self, coords: np.ndarray) -> typing.List[str]:
+        """
+        Returns the encoded location names of the (y,x) coordinates in coords (an array of shape (n, 2)).
+        """
+
+        return [self.encode_message(self.coordinate_to_location[(int(y), int(x))]) for y, x in coords]
+
+
+    def range_count(self, lo: int, hi: int) -> int:
+        """
+        Counts the cells of self.loc_grid whose code lies in [lo, hi]. Every row is bisected, which takes
+        O(h log w) time instead of scanning the full grid.
+
+        :param lo: The lower bound of the range (inclusive)
+        :param hi: The upper bound of the range (inclusive)
+
+        Returns:
+          The number of cells with a code in [lo, hi]
+        """
+
+        starts, ends = self._row_bounds(lo, hi)
+        return int(np.sum(ends - starts))
+
+
+    def range_report(self, lo: int, hi: int) -> typing.Tuple[np.ndarray, typing.List[str]]:
+        """
+        Reports all cells of self.loc_grid whose code lies in [lo, hi], using the same row bisection as self.range_count().
+
+        :param lo: The lower bound of the range (inclusive)
+        :param hi: The upper bound of the range (inclusive)
+
+        Returns:
+          A tuple (coords, locations): coords is an array of shape (n, 2) with the (y,x) coordinates in row-major
+          order and locations the list of corresponding encoded location names
+        """
+
+        starts, ends = self._row_bounds(lo, hi)
+        ys = np.repeat(np.arange(len(starts)), ends - starts)
+        xs = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)]) if len(starts) else ys
+        coords = np.stack([ys, xs.astype(ys.dtype)], axis=1)
+        return coords, self._encoded_locations(coords)
+
+
+    def nearest_values(self, value: int, k: int = 1) -> typing.Tuple[np.ndarray, typing.List[str]]:
+        """
+        Finds the k cells of self.loc_grid whose codes are closest to value. Every row is bisected for value, and only
+        the k cells on either side of the insertion point can be among the k nearest, so this takes O(h (log w + k)) time.
+        Ties are broken in row-major order.
+
+        :param value: The value to which the codes should be close
+        :param k: The number of cells to return
+
+        Returns:
+          A tuple (coords, locations): coords is an array of shape (k, 2) with the (y,x) coordinates ordered from nearest
+          to farthest and locations the list of corresponding encoded location names
+        """
+
+        # a value outside the range of the grid's dtype is bisected as the nearest value inside it
+        probe = value
+        if self.loc_grid.dtype.kind == 'i':
+            info = np.iinfo(self.loc_grid.dtype)
+            probe = min(max(value, int(info.min)), int(info.max))
+
+        rows, cols = self.loc_grid.shape
+        candidates = []
+        for y in range(rows):
+            split = int(np.searchsorted(self.loc_grid[y], probe))
+            for x in range(max(0, split - k), min(cols, split + k)):
+                candidates.append((y, x))
+
+        coords = np.array(candidates, dtype=np.intp).reshape(-1, 2)
+        codes = self.loc_grid[coords[:, 0], coords[:, 1]]
+        if self.loc_grid.dtype.kind == 'i':
+            # empty cells are never returned
+            valid = codes != empty_cell_value(self.loc_grid.dtype)
+            coords, codes = coords[valid], codes[valid]
+        # the distances are Python numbers, so they cannot overflow (there are at most 2k candidates per row)
+        distances = [abs(code - value) for code in codes.tolist()]
+        order = sorted(range(len(distances)), key=distances.__getitem__)[:k]
+        coords = coords[order]
+        return coords, self._encoded_locations(coords)
+
+
+    def batch_search(self, values: typing.Iterable[int]) -> typing.List[typing.Optional[typing.Tuple[int, int]]]:
+        """
+        Vectorised lookup of many values at once. Every (sorted) row of self.loc_grid is bisected for all values in
+        a single np.searchsorted call, so the cost is O(h m log w) NumPy work for m values instead of m separate
+        Python searches. If a value occurs more than once, the occurrence in the topmost row is returned.
+
+        :param values: The values that we are searching for in self.loc_grid
+
+        Returns:
+          A list with for every value None (if it does not occur in self.loc_grid) or its (y,x) location
+        """
+
+        values = np.asarray(list(values), dtype=np.int64)
+        rows, cols = self.loc_grid.shape
+        found_y = np.full(len(values), -1, dtype=np.intp)
+        found_x = np.full(len(values), -1, dtype=np.intp)
+        if cols == 0:
+            return [None] * len(values)
+
+        for y in range(rows):
+            todo = np.flatnonzero(found_y < 0)
+            if len(todo) == 0:
+                break
+            row = self.loc_grid[y]
+            xs = np.minimum(np.searchsorted(row, values[todo]), cols - 1)
+            hit = row[xs] == values[todo]
+            if self.loc_grid.dtype.kind == 'i':
+                hit &= values[todo] < empty_cell_value(self.loc_grid.dtype)
+            found_y[todo[hit]] = y
+            found_x[todo[hit]] = xs[hit]
+
+        return [None if y < 0 else (int(y), int(x)) for y, x in zip(found_y, found_x)]
+
+
+    def start_batch_search(self, values: typing.Iterable[int]) -> typing.List[typing.Optional[str]]:
+        """
+        Batch version of self.start_search() that uses self.batch_search().
+
+        :param values: The values that we are searching for in self.loc_grid
+
+        Returns:
+          A list with for every value None (if it does not occur in self.loc_grid) or its encoded location name
+        """
+
+        return [None if result is None else self.encode_message(self.coordinate_to_location[result])
+                for result in self.batch_search(values)]
+
+
+    def parallel_search(self, value: int, pool: typing.Optional[futures.Executor] = None, workers: int = None,
+                        min_cells: int = PARALLEL_MIN_CELLS) -> typing.Optional[typing.Tuple[int, int]]:
+        """
+        Parallel version of the divide and conquer search. The grid is split into horizontal bands (each band is
+        itself sorted along rows and columns) and every band is searched with self.divconq_search() in a thread or
+        process pool. As soon as one of the bands returns a hit, the other sub-searches are stopped: the ones that have
+        not started yet are cancelled and the running ones see a shared stop flag (a threading.Event, or a flag byte in
+        shared memory for a process pool) and return. For a process pool, self.loc_grid is placed in shared memory (see
+        self.share_loc_grid()) so the workers do not each receive a copy of the grid. Grids with fewer than min_cells
+        cells are searched serially.
+
+        :param value: The value that we are searching for in self.loc_grid
+        :param pool: An existing thread or process pool to use. If None, the process pool of self.search_pool() is
+                     used, which is created once and reused by later searches (the recursive search holds the GIL,
+                     so threads do not search in parallel)
+        :param workers: The number of bands (and workers of a newly created pool). Defaults to os.cpu_count()
+        :param min_cells: The size threshold below which the search falls back to the serial search
+
+        Returns:
+          None if the value does not occur in self.loc_grid
+          A tuple (y,x) specifying the location where the value was found
+        """
+
+        rows, cols = self.loc_grid.shape
+        if self._is_empty_value(value):
+            return None
+        workers = workers or os.cpu_count() or 1
+        if rows * cols < min_cells or rows < 2 or workers < 2:
+            return self.divconq_search(value, x_from=0, x_to=cols - 1, y_from=0, y_to=rows - 1)
+
+        if pool is None:
+            pool = self.search_pool(workers)
+
+        bands = [(int(band[0]), int(band[-1])) for band in np.array_split(np.arange(rows), min(workers, rows))]
+        if isinstance(pool, futures.ProcessPoolExecutor):
+            shm = self.share_loc_grid()
+            stop_flag = shared_memory.SharedMemory(create=True, size=1)
+            stop_flag.buf[0] = 0
+            jobs = [pool.submit(_search_shared_band, shm.name, self.loc_grid.shape, self.loc_grid.dtype.str,
+                                value, y_from, y_to, stop_flag.name) for y_from, y_to in bands]
+        else:
+            stop_flag = threading.Event()
+            jobs = [pool.submit(self.divconq_search, value, 0, cols - 1, y_from, y_to, 0, stop_flag.is_set)
+                    for y_from, y_to in bands]
+
+        try:
+            for job in futures.as_completed(jobs):
+                result = job.result()
+                if result is not None:
+                    return result
+            return None
+        finally:
+            # stop the running sub-searches and drop the ones that have not started yet
+            for job in jobs:
+                job.cancel()
+            if isinstance(stop_flag, threading.Event):
+                stop_flag.set()
+            else:
+                stop_flag.buf[0] = 1
+                _release_shared_memory(stop_flag)
+
+
+    def search_pool(self, workers: int = None) -> futures.ProcessPoolExecutor:
+        """
+        Returns the process pool used by self.parallel_search() when no pool is given. It is created on first use
+        with the given number of workers and shut down by self.close() or when the device is garbage collected.
+        """
+
+        if self._search_pool is None:
+            self._search_pool = futures.ProcessPoolExecutor(max_workers=workers)
+            self._search_pool_finalizer = weakref.finalize(self, self._search_pool.shutdown, wait=False,
+                                                           cancel_futures=True)
+        return self._search_pool
+
+
+    def share_loc_grid(self) -> shared_memory.SharedMemory:
+        """
+        Copies self.loc_grid into a shared memory block (once) so that worker processes can attach to it by name.
+        The block is reused as long as self.loc_grid is not replaced. It is released with
+        self.release_shared_loc_grid() or self.close(), and otherwise when the device is garbage collected or the
+        interpreter exits.
+
+        Returns:
+          The SharedMemory block that holds a copy of self.loc_grid
+        """
+
+        shared = getattr(self, "_shared_grid", None)
+        if shared is not None and shared[0] is self.loc_grid:
+            return shared[1]
+        self.release_shared_loc_grid()
+
+        shm = shared_memory.SharedMemory(create=True, size=max(self.loc_grid.nbytes, 1))
+        view = np.ndarray(self.loc_grid.shape, dtype=self.loc_grid.dtype, buffer=shm.buf)
+        view[:] = self.loc_grid
+        del view
+        self._shared_grid = (self.loc_grid, shm, weakref.finalize(self, _release_shared_memory, shm))
+        return shm
+
+
+    def release_shared_loc_grid(self):
+        """
+        Releases the shared memory block created by self.share_loc_grid() (if any).
+        """
+
+        shared = getattr(self, "_shared_grid", None)
+        if shared is not None:
+            # the finalizer releases the block at most once
+            shared[2]()
+            self._shared_grid = None
+
+
+    def close(self):
+        """
+        Shuts down the process pool of self.search_pool() and releases the shared memory grid. The device can also be
+        used as a context manager that closes it on exit.
+        """
+
+        self.release_shared_loc_grid()
+        if self._search_pool is not None:
+            self._search_pool_finalizer()
+            self._search_pool = None
+
+
+    def __enter__(self) -> "IntelDevice":
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def enable_stats(self) -> SearchStats:
+        """
+        Enables the search instrumentation: the number of cells probed, sub-rectangles visited and pruned, the maximum
+        recursion depth and the wall time per start_search query are collected in a new SearchStats object. When the
+        instrumentation is disabled, the searches only pay for a single `is None` check per visited sub-rectangle.
+        The counts of a parallel search with a process pool are not collected.
+
+        Returns:
+          The SearchStats object that collects the counts
+        """
+
+        self.stats = SearchStats()
+        return self.stats
+
+
+    def disable_stats(self) -> typing.Optional[SearchStats]:
+        """
+        Disables the search instrumentation.
+
+        Returns:
+          The SearchStats object with the counts collected so far (or None if the instrumentation was not enabled)
+        """
+
+        stats, self.stats = self.stats, None
+        return stats
+
+
+    def start_search(self, value, mode: str = "divconq", **kwargs) -> str:
         """
         Non-recursive function that starts the recursive divide and conquer search function above. You can assume
         that self.coordinate_to_location and self.loc_grid have already been filled before this function is called (so 
         make sure not to call them again in this function). 
         
         :param value: The value that we are searching for in self.loc_grid
+        :param mode: The search strategy that is used, one of SEARCH_MODES ("divconq", "iterative" or "parallel")
+        :param kwargs: Extra keyword arguments for the search strategy (e.g. pool= for the parallel search)
+
+        The results are cached per value in self.search_cache (see self.cache_info()). The cache is cleared when the
+        grid or the locations are filled or loaded again, but not when self.loc_grid is assigned directly.
 
         Returns:
           None if the value does not occur in self.loc_grid
@@ -241,12 +1307,263 @@ class IntelDevice:
           corresponding name of the location (encoded with self.encode_message). 
         """
 
+        stats = self.stats
+        if stats is not None:
+            # max_depth is measured per query and merged into the total afterwards
+            before = stats.snapshot()
+            stats.max_depth = 0
+            start_time = time.perf_counter()
+
+        # repeated queries are answered from the LRU cache, skipping both the search and the encoding
+        cached = self.search_cache.get(value, _NOT_CACHED)
+        if cached is not _NOT_CACHED:
+            if stats is not None:
+                self._record_query(stats, before, start_time, value, mode, cached=True)
+            return cached
+
         # process raw locations with caesar shift, 
         # construct the loc_grid and start the search
-        result = self.divconq_search(value, x_from=0, x_to=self.loc_grid.shape[1]-1, y_from=0, y_to=self.loc_grid.shape[0]-1)
-
-        if result is None:
-            return result
+        if mode == "divconq":
+            result = self.divconq_search(value, x_from=0, x_to=self.loc_grid.shape[1]-1, y_from=0, y_to=self.loc_grid.shape[0]-1)
+        elif mode == "iterative":
+            result = self.iterative_search(value)
+        elif mode == "parallel":
+            result = self.parallel_search(value, **kwargs)
         else:
-            return self.encode_message(self.coordinate_to_location[result])
-        
\ No newline at end of file
+            raise ValueError(f"unknown search mode {mode!r}, expected one of {SEARCH_MODES}")
+
+        # empty cells (see self.delete and self.fill_loc_grid) are not a match
+        if result is not None and self._is_empty_value(value):
+            result = None
+
+        if result is not None:
+            result = self.encode_message(self.coordinate_to_location[result])
+        self.search_cache.put(value, result)
+
+        if stats is not None:
+            self._record_query(stats, before, start_time, value, mode, cached=False)
+        return result
+
+
+    def _record_query(self, stats: SearchStats, before: typing.Dict[str, float], start_time: float,
+                      value: int, mode: str, cached: bool):
+        """
+        Appends the counts of one start_search query (the difference with the totals before the query) to stats.queries.
+        """
+
+        elapsed = time.perf_counter() - start_time
+        stats.wall_time += elapsed
+        after = stats.snapshot()
+        query = {key: after[key] - before[key] for key in ("cells_probed", "nodes", "pruned")}
+        query.update(value=value, mode=mode, cached=cached, max_depth=stats.max_depth, wall_time=elapsed)
+        stats.queries.append(query)
+        stats.max_depth = max(stats.max_depth, before["max_depth"])
+
+
+    def cache_info(self) -> typing.Dict[str, int]:
+        """
+        Returns the hit, miss and eviction counters of the start_search LRU cache.
+        """
+
+        return self.search_cache.info()
+
+
+# the search strategies that can be passed to IntelDevice.start_search
+SEARCH_MODES = ("divconq", "iterative", "parallel")
+
+
+def _is_replaceable_snapshot_directory(directory: str) -> bool:
+    """
+    Returns whether IntelDevice.save_snapshot may replace the existing path: an empty directory or a directory
+    with the meta.json of a snapshot of a known version.
+    """
+
+    if not os.path.isdir(directory) or os.path.islink(directory):
+        return False
+    if not os.listdir(directory):
+        return True
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return isinstance(meta, dict) and meta.get("version") == SNAPSHOT_VERSION
+
+
+def _release_shared_memory(shm: shared_memory.SharedMemory):
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    Attaches to an existing shared memory block, which is owned (and unlinked) by the process that created it, in a
+    worker process of IntelDevice.parallel_search. The block is not registered with the resource tracker: a
+    registration that arrives after the owner unlinked the block would be reported as a leak.
+    """
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+
+    # before Python 3.13 attaching always registers the block. The workers share the resource tracker of the owner,
+    # which keeps a single entry per name, so unregistering afterwards would drop the owner's registration instead;
+    # the registration is skipped (the worker runs one search at a time, so no other thread attaches meanwhile)
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _search_shared_band(shm_name: str, shape: typing.Tuple[int, int], dtype: str, value: int,
+                        y_from: int, y_to: int, stop_name: str = None) -> typing.Optional[typing.Tuple[int, int]]:
+    """
+    Worker function for IntelDevice.parallel_search with a process pool. Attaches to the shared memory grid and
+    searches the rows y_from up to (and including) y_to with the regular divide and conquer search, until the flag
+    byte in the shared memory block stop_name is set.
+    """
+
+    try:
+        stop_flag = _attach_shared_memory(stop_name) if stop_name is not None else None
+    except FileNotFoundError:
+        # the search has already finished and released its stop flag
+        return None
+    shm = _attach_shared_memory(shm_name)
+    try:
+        device = IntelDevice(shape[1], shape[0], [], [], 0)
+        device.loc_grid = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        stop = (lambda: stop_flag.buf[0] != 0) if stop_flag is not None else None
+        result = device.divconq_search(value, 0, shape[1] - 1, int(y_from), int(y_to), 0, stop)
+        # drop the view on the shared buffer before closing it
+        device.loc_grid = None
+        return result
+    finally:
+        shm.close()
+        if stop_flag is not None:
+            stop_flag.close()
+
+
+class ShardedIntelDevice:
+    def __init__(self, max_workers: int = None):
+        """
+        Front-end over multiple IntelDevice shards (e.g. one grid per region). For every shard, the range [min, max] of
+        its codes is kept, so that a query is only sent to the shards whose range can contain the value. The candidate
+        shards of a single value are searched one by one, as IntelDevice.start_search is pure Python and holds the
+        GIL; batches are answered per shard with NumPy in a thread pool. Shards can be added without rebuilding the
+        other shards.
+
+        :param max_workers: The number of threads used to answer batches of values in parallel
+        """
+
+        self.shards = []
+        self.names = []
+        self.lows = np.empty(0, dtype=np.int64)
+        self.highs = np.empty(0, dtype=np.int64)
+        self.pool = futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    @staticmethod
+    def code_range(device: IntelDevice) -> typing.Tuple[int, int]:
+        """
+        Returns the smallest and largest code in device.loc_grid (ignoring empty cells).
+        An empty range (1, 0) is returned for a grid without codes.
+        """
+
+        grid = device.loc_grid
+        if grid.dtype.kind != 'i':
+            return (int(grid.min()), int(grid.max())) if grid.size else (1, 0)
+
+        info = np.iinfo(grid.dtype)
+        valid = grid != empty_cell_value(grid.dtype)
+        if not valid.any():
+            return 1, 0
+        return int(grid.min(where=valid, initial=info.max)), int(grid.max(where=valid, initial=info.min))
+
+    def add_shard(self, device: IntelDevice, name: str = None) -> int:
+        """
+        Adds a shard (with filled loc_grid and coordinate_to_location). The other shards are not touched.
+
+        :param device: The IntelDevice of the shard
+        :param name: A name for the shard, by default its index
+
+        Returns:
+          The index of the new shard
+        """
+
+        low, high = self.code_range(device)
+        self.shards.append(device)
+        self.names.append(name if name is not None else str(len(self.shards) - 1))
+        self.lows = np.append(self.lows, low)
+        self.highs = np.append(self.highs, high)
+        return len(self.shards) - 1
+
+    def refresh_shard(self, index: int):
+        """
+        Recomputes the code range of a shard after its grid was changed (e.g. with IntelDevice.update or insert).
+        """
+
+        self.lows[index], self.highs[index] = self.code_range(self.shards[index])
+
+    def candidate_shards(self, value: int) -> np.ndarray:
+        """
+        Returns the indices of the shards whose code range contains value.
+        """
+
+        return np.flatnonzero((self.lows <= value) & (value <= self.highs))
+
+    def start_search(self, value: int) -> typing.Optional[typing.Tuple[str, str]]:
+        """
+        Searches value in the shards whose code range can contain it, in the order in which they were added, and
+        stops at the first hit. So if several shards contain the value, the hit in the shard that was added first is
+        returned.
+
+        :param value: The value that we are searching for
+
+        Returns:
+          None if the value does not occur in any shard, otherwise a tuple (shard name, encoded location)
+        """
+
+        for index in self.candidate_shards(value):
+            result = self.shards[index].start_search(value)
+            if result is not None:
+                return self.names[index], result
+        return None
+
+    def start_batch_search(self, values: typing.Iterable[int]) -> typing.List[typing.Optional[typing.Tuple[str, str]]]:
+        """
+        Batch version of self.start_search(). The values are grouped per candidate shard and every shard answers
+        its group with a single IntelDevice.start_batch_search() call; the shards are searched in parallel.
+
+        :param values: The values that we are searching for
+
+        Returns:
+          A list with for every value None or a tuple (shard name, encoded location)
+        """
+
+        values = np.asarray(list(values), dtype=np.int64)
+        # in_range[s, i] tells whether value i falls in the code range of shard s
+        in_range = (self.lows[:, None] <= values[None, :]) & (values[None, :] <= self.highs[:, None])
+
+        def search_shard(index):
+            positions = np.flatnonzero(in_range[index])
+            return positions, self.shards[index].start_batch_search(values[positions])
+
+        answers = [None] * len(values)
+        shards = [index for index in range(len(self.shards)) if in_range[index].any()]
+        for index, (positions, results) in zip(shards, self.pool.map(search_shard, shards)):
+            for position, result in zip(positions, results):
+                if result is not None and answers[position] is None:
+                    answers[position] = (self.names[index], result)
+        return answers
+
+    def close(self):
+        """
+        Shuts down the thread pool.
+        """
+
+        self.pool.shutdown()
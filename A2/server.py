@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import typing
+
+import numpy as np
+
+from divconq import IntelDevice
+
+# the range of values that IntelDevice.batch_search accepts (the values are converted to int64)
+VALUE_MIN, VALUE_MAX = int(np.iinfo(np.int64).min), int(np.iinfo(np.int64).max)
+
+
+class IntelServer:
+    def __init__(self, device: IntelDevice, batch_window: float = 0.002, max_batch: int = 1024, exact: bool = True):
+        """
+        Asyncio front-end for an IntelDevice. Clients send one value per line and get back one line per value with
+        the encoded location (or "None" if the value does not occur). Queries that arrive within batch_window seconds
+        of each other (from any client) are answered together by self.lookup(), which runs in a worker thread so that
+        the event loop keeps accepting queries in the meantime.
+
+        If a value occurs more than once in the grid, the answer depends on exact: with exact=True the server answers
+        with the same location as IntelDevice.start_search() (and uses its LRU cache), with exact=False it answers
+        with the occurrence in the topmost row, like IntelDevice.start_batch_search().
+
+        :param device: The IntelDevice (with filled loc_grid and coordinate_to_location) that answers the queries
+        :param batch_window: The number of seconds to wait for more queries before a batch is looked up
+        :param max_batch: The maximum number of queries in one batch
+        :param exact: Whether to answer with the location that IntelDevice.start_search() returns
+        """
+
+        self.device = device
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.exact = exact
+
+        # queue of (value, future) pairs waiting to be looked up
+        self.pending = None
+        self.batcher = None
+
+    async def query(self, value: int) -> typing.Optional[str]:
+        """
+        Queues a single value for the next batch and waits for its encoded location.
+
+        :param value: The value that we are searching for
+
+        Returns:
+          None if the value does not occur, otherwise the encoded location name
+        """
+
+        self._ensure_batcher()
+        future = asyncio.get_running_loop().create_future()
+        await self.pending.put((value, future))
+        return await future
+
+    def lookup(self, values: typing.List[int]) -> typing.List[typing.Optional[str]]:
+        """
+        Looks up one batch of values. With self.exact, a single vectorised IntelDevice.batch_search() call sorts out
+        the values that do not occur, and only the values that do are searched with IntelDevice.start_search(), once
+        per distinct value. Otherwise the whole batch is answered by IntelDevice.start_batch_search().
+
+        Returns:
+          A list with for every value None or its encoded location name
+        """
+
+        if not self.exact:
+            return self.device.start_batch_search(values)
+
+        unique = list(dict.fromkeys(values))
+        answers = {value: None if cell is None else self.device.start_search(value)
+                   for value, cell in zip(unique, self.device.batch_search(unique))}
+        return [answers[value] for value in values]
+
+    def _ensure_batcher(self):
+        if self.batcher is None or self.batcher.done():
+            self.pending = asyncio.Queue()
+            self.batcher = asyncio.ensure_future(self._batch_loop())
+
+    async def _batch_loop(self):
+        """
+        Collects queued queries into micro-batches and answers every batch with one self.lookup() call.
+        """
+
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.pending.get()]
+
+            # wait for more queries to arrive within the batch window
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.pending.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            values = [value for value, _ in batch]
+            try:
+                answers = await loop.run_in_executor(None, self.lookup, values)
+            except Exception:
+                # never fail the whole batch because of one entry: answer the queries one by one, so that an error
+                # only reaches the client whose query caused it
+                for value, future in batch:
+                    try:
+                        answer = (await loop.run_in_executor(None, self.lookup, [value]))[0]
+                    except Exception as error:
+                        if not future.done():
+                            future.set_exception(error)
+                    else:
+                        if not future.done():
+                            future.set_result(answer)
+                continue
+
+            for (_, future), answer in zip(batch, answers):
+                if not future.done():
+                    future.set_result(answer)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Handles one client connection. Requests may be pipelined: every line is queued immediately and the answers
+        are streamed back in the order of the requests.
+        """
+
+        answers = asyncio.Queue()
+
+        async def write_answers():
+            while True:
+                answer = await answers.get()
+                if answer is None:
+                    break
+                try:
+                    result = await answer
+                except (ValueError, OverflowError):
+                    result = "ERROR invalid value"
+                except Exception:
+                    result = "ERROR internal error"
+                writer.write(f"{result}\n".encode())
+                await writer.drain()
+
+        writer_task = asyncio.ensure_future(write_answers())
+        try:
+            async for line in reader:
+                line = line.strip()
+                if not line:
+                    continue
+                answers.put_nowait(asyncio.ensure_future(self._parse_and_query(line)))
+        finally:
+            answers.put_nowait(None)
+            await writer_task
+            writer.close()
+
+    async def _parse_and_query(self, line: bytes) -> typing.Optional[str]:
+        # validate every value before it joins a shared batch
+        value = int(line)
+        if not VALUE_MIN <= value <= VALUE_MAX:
+            raise ValueError(f"value {value} does not fit in int64")
+        return await self.query(value)
+
+    async def start(self, host: str = None, port: int = None, path: str = None) -> asyncio.AbstractServer:
+        """
+        Starts listening on a TCP (host, port) or a Unix socket (path).
+
+        Returns:
+          The asyncio server object
+        """
+
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle_client, path=path)
+        return await asyncio.start_server(self.handle_client, host=host, port=port)
+
+
+def load_device(grid_path: str, locations_path: str, caesar_shift: int) -> IntelDevice:
+    """
+    Builds an IntelDevice from a grid saved with IntelDevice.save_loc_grid() and a file with one encoded location
+    name per line.
+    """
+
+    with open(locations_path) as f:
+        enc_locations = [line.strip() for line in f if line.strip()]
+
+    device = IntelDevice(0, 0, enc_locations, [], caesar_shift)
+    device.load_loc_grid(grid_path)
+    device.height, device.width = device.loc_grid.shape
+    device.fill_coordinate_to_loc()
+    return device
+
+
+def main(argv: typing.List[str] = None):
+    parser = argparse.ArgumentParser(description="Serve IntelDevice queries over TCP or a Unix socket")
+    parser.add_argument("grid", help=".npy file written by IntelDevice.save_loc_grid()")
+    parser.add_argument("locations", help="file with one encoded location name per line")
+    parser.add_argument("--shift", type=int, required=True, help="the caesar shift of the encoded messages")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--batch-window", type=float, default=0.002, help="micro-batch window in seconds")
+    parser.add_argument("--topmost", action="store_true",
+                        help="answer values that occur more than once with their topmost occurrence (one vectorised "
+                             "lookup per batch) instead of the location start_search returns")
+    args = parser.parse_args(argv)
+
+    server = IntelServer(load_device(args.grid, args.locations, args.shift), batch_window=args.batch_window,
+                          exact=not args.topmost)
+
+    async def serve():
+        listener = await server.start(host=args.host, port=args.port, path=args.unix)
+        async with listener:
+            await listener.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,19 @@
+import asyncio
+import gc
+import os
+import subprocess
+import sys
+import tempfile
 import typing
 import unittest
+from unittest import mock
+from concurrent import futures
+from multiprocessing import shared_memory
 import numpy as np
 
-from divconq import IntelDevice
+import benchmark
+from divconq import IntelDevice, SEARCH_MODES, ShardedIntelDevice
+from server import IntelServer
 
 
 class TestIntelDevice(unittest.TestCase):
@@ -73,4 +84,549 @@ class TestIntelDevice(unittest.TestCase):
         # values that do not occur should lead to None
         for v in [0, 2, 14, 18, 31, 48, 60]:
             result = ob.start_search(v)
-            self.assertIsNone(result)
\ No newline at end of file
+            self.assertIsNone(result)
+
+    def test_fill_coordinate_to_loc_is_lazy(self):
+        device = IntelDevice(2, 2, [], [], 3)
+        device.enc_locations = [device.encode_message(name) for name in ["a", "b", "c", "d"]]
+        device.fill_coordinate_to_loc()
+
+        # nothing is decoded before the first lookup
+        self.assertEqual(device.coordinate_to_location.cache, [None] * 4)
+
+        self.assertEqual(device.coordinate_to_location[(1, 0)], "c")
+        self.assertEqual(device.coordinate_to_location.cache, [None, None, "c", None])
+
+        self.assertEqual(dict(device.coordinate_to_location), {(0, 0): "a", (0, 1): "b", (1, 0): "c", (1, 1): "d"})
+        self.assertNotIn((2, 0), device.coordinate_to_location)
+
+    def test_loc_grid_compact_dtype_and_mmap(self):
+        device = IntelDevice(2, 2, [], [], 0)
+        device.enc_codes = [device.encode_message(str(code)) for code in [-5, 100, 3, 40000]]
+        device.fill_loc_grid()
+
+        # 40000 does not fit in 16 bits, so int32 is the smallest type
+        self.assertEqual(device.loc_grid.dtype, np.int32)
+        self.assertEqual(device.loc_grid.tolist(), [[-5, 100], [3, 40000]])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "grid.npy")
+            device.save_loc_grid(path)
+
+            other = IntelDevice(2, 2, [], [], 0)
+            other.load_loc_grid(path)
+            self.assertIsInstance(other.loc_grid, np.memmap)
+            self.assertEqual(other.loc_grid.tolist(), [[-5, 100], [3, 40000]])
+            del other
+
+    def test_fill_loc_grid_from_iterator_and_file(self):
+        device = IntelDevice(3, 2, [], [], 4)
+        codes = [1, 2, 300, 4, 5, 70000, 7]
+        enc_codes = [device.encode_message(str(code)) for code in codes]
+
+        # the codes are consumed lazily, in chunks of one row
+        device.fill_loc_grid_from(iter(enc_codes), chunk_rows=1)
+        empty = np.iinfo(np.int32).max
+        self.assertEqual(device.loc_grid.tolist(), [[1, 2, 300], [4, 5, 70000], [7, empty, empty]])
+        self.assertEqual(device.loc_grid.dtype, np.int32)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "codes.txt")
+            with open(path, "w") as f:
+                f.write("\n".join(enc_codes[:6]) + "\n")
+            device.fill_loc_grid_from(path)
+        self.assertEqual(device.loc_grid.tolist(), [[1, 2, 300], [4, 5, 70000]])
+
+    def test_parallel_search(self):
+        grid = np.add.outer(np.arange(20) * 3, np.arange(30) * 2)
+        device = IntelDevice(30, 20, [], [], 0)
+        device.loc_grid = grid
+
+        for value in [0, 5, 57, 115, 200, -1]:
+            serial = device.divconq_search(value, 0, 29, 0, 19)
+            threaded = device.parallel_search(value, workers=4, min_cells=0)
+            self.assertEqual(threaded is None, serial is None)
+            if threaded is not None:
+                self.assertEqual(grid[threaded], value)
+
+        with futures.ProcessPoolExecutor(2) as pool:
+            y, x = device.parallel_search(115, pool=pool, workers=2, min_cells=0)
+            self.assertEqual(grid[y, x], 115)
+        device.release_shared_loc_grid()
+
+        # without a pool, one process pool is created and reused
+        with device:
+            self.assertEqual(grid[device.parallel_search(57, workers=2, min_cells=0)], 57)
+            pool = device.search_pool()
+            self.assertIsNone(device.parallel_search(-1, workers=2, min_cells=0))
+            self.assertIs(device.search_pool(), pool)
+        self.assertIsNone(device._search_pool)
+
+    def test_stopped_search_probes_no_cells(self):
+        device = IntelDevice(30, 20, [], [], 0)
+        device.loc_grid = np.add.outer(np.arange(20) * 3, np.arange(30) * 2)
+        stats = device.enable_stats()
+        self.assertIsNone(device.divconq_search(115, 0, 29, 0, 19, stop=lambda: True))
+        self.assertEqual(stats.cells_probed, 0)
+        self.assertEqual(device.divconq_search(115, 0, 29, 0, 19, stop=lambda: False), (19, 29))
+
+    def test_shared_grid_is_released_with_the_device(self):
+        device = IntelDevice(3, 2, [], [], 0)
+        device.loc_grid = np.arange(6).reshape(2, 3)
+        name = device.share_loc_grid().name
+        del device
+        gc.collect()
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+    def test_process_search_leaves_no_tracked_shared_memory(self):
+        # the resource tracker reports leaked or doubly unlinked blocks on stderr when the interpreter exits. 0 is
+        # found at once, so the stop flag is often unlinked before the workers of the other bands attach to it
+        script = (
+            "import numpy as np\n"
+            "from divconq import IntelDevice\n"
+            "device = IntelDevice(64, 64, [], [], 0)\n"
+            "device.loc_grid = np.add.outer(np.arange(64) * 64, np.arange(64))\n"
+            "with device:\n"
+            "    for value in [0] * 100:\n"
+            "        device.parallel_search(value, workers=4, min_cells=0)\n"
+        )
+        result = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stderr, "")
+
+    def test_iterative_search_matches_divconq(self):
+        rng = np.random.default_rng(0)
+        for rows, cols in [(1, 1), (1, 7), (6, 1), (5, 8), (9, 4)]:
+            grid = np.cumsum(np.cumsum(rng.integers(0, 3, size=(rows, cols)), axis=0), axis=1) - 10
+            device = IntelDevice(cols, rows, [], [], 0)
+            device.loc_grid = grid.astype(np.int16)
+
+            for value in range(int(grid.min()) - 2, int(grid.max()) + 3):
+                result = device.iterative_search(value)
+                if value in grid:
+                    self.assertEqual(grid[result], value)
+                else:
+                    self.assertIsNone(result)
+
+    def test_range_and_nearest_queries(self):
+        grid = np.array([
+            [1, 4, 7, 11],
+            [2, 5, 8, 12],
+            [3, 6, 9, 16]
+        ], dtype=np.int8)
+        device = IntelDevice(4, 3, [], [], 1)
+        device.enc_locations = [device.encode_message(f"l{i}") for i in range(12)]
+        device.fill_coordinate_to_loc()
+        device.loc_grid = grid
+
+        self.assertEqual(device.range_count(4, 8), 5)
+        self.assertEqual(device.range_count(13, 15), 0)
+
+        coords, locations = device.range_report(4, 8)
+        self.assertEqual(coords.tolist(), [[0, 1], [0, 2], [1, 1], [1, 2], [2, 1]])
+        self.assertEqual(locations, [device.encode_message(name) for name in ["l1", "l2", "l5", "l6", "l9"]])
+
+        coords, locations = device.nearest_values(14)
+        self.assertEqual(coords.tolist(), [[1, 3]])
+        self.assertEqual(locations, [device.encode_message("l7")])
+
+        coords, _ = device.nearest_values(10, k=3)
+        self.assertEqual([grid[y, x] for y, x in coords], [11, 9, 8])
+
+        # values outside the int64 range are compared with the codes without overflowing
+        coords, _ = device.nearest_values(10 ** 20, k=2)
+        self.assertEqual([grid[y, x] for y, x in coords], [16, 12])
+        coords, _ = device.nearest_values(-10 ** 20)
+        self.assertEqual([grid[y, x] for y, x in coords], [grid.min()])
+
+        coords, locations = device.range_report(20, 30)
+        self.assertEqual(coords.shape, (0, 2))
+        self.assertEqual(locations, [])
+
+    def test_batch_search(self):
+        grid = np.array([
+            [1, 4, 7],
+            [2, 5, 8],
+            [3, 6, 9]
+        ])
+        device = IntelDevice(3, 3, [], [], 0)
+        device.loc_grid = grid
+
+        results = device.batch_search([5, 1, 10, 9, 0])
+        self.assertEqual(results, [(1, 1), (0, 0), None, (2, 2), None])
+
+    def test_start_search_lru_cache(self):
+        device = IntelDevice(2, 2, [], [], 1, cache_size=2)
+        device.enc_locations = [device.encode_message(name) for name in ["a", "b", "c", "d"]]
+        device.enc_codes = [device.encode_message(str(code)) for code in [1, 3, 2, 4]]
+        device.fill_coordinate_to_loc()
+        device.fill_loc_grid()
+
+        self.assertEqual(device.start_search(3), device.encode_message("b"))
+        self.assertIsNone(device.start_search(10))
+        self.assertEqual(device.start_search(3), device.encode_message("b"))
+        self.assertIsNone(device.start_search(10))
+        self.assertEqual(device.start_search(4), device.encode_message("d"))  # evicts 3
+        self.assertEqual(device.cache_info(), {"hits": 2, "misses": 3, "evictions": 1, "size": 2, "maxsize": 2})
+
+        # refilling the grid invalidates the cache
+        device.enc_codes = [device.encode_message(str(code)) for code in [1, 2, 4, 10]]
+        device.fill_loc_grid()
+        self.assertEqual(device.start_search(10), device.encode_message("d"))
+        self.assertEqual(device.cache_info()["hits"], 2)
+
+    def test_incremental_updates_keep_grid_sorted(self):
+        device = IntelDevice(3, 3, [], [], 2)
+        codes = [1, 4, 7, 2, 5, 8, 3, 6, 9]
+        device.enc_locations = [device.encode_message(f"l{code}") for code in codes]
+        device.enc_codes = [device.encode_message(str(code)) for code in codes]
+        device.fill_coordinate_to_loc()
+        device.fill_loc_grid()
+
+        def check_sorted():
+            grid = device.loc_grid
+            self.assertTrue(np.all(np.diff(grid, axis=0) >= 0) and np.all(np.diff(grid, axis=1) >= 0))
+
+        # the location names move together with their codes
+        position = device.update(0, 0, 10)
+        check_sorted()
+        self.assertEqual(device.loc_grid[position], 10)
+        self.assertEqual(device.coordinate_to_location[position], "l1")
+        self.assertEqual(device.start_search(10), device.encode_message("l1"))
+
+        device.delete(1, 1)
+        check_sorted()
+        self.assertIsNone(device.start_search(5))
+        self.assertEqual(len(device.coordinate_to_location), 8)
+
+        position = device.insert(1000, "new")
+        check_sorted()
+        self.assertEqual(device.loc_grid.dtype, np.int16)
+        self.assertEqual(device.start_search(1000), device.encode_message("new"))
+        for code in [2, 3, 4, 6, 7, 8, 9]:
+            self.assertEqual(device.start_search(code), device.encode_message(f"l{code}"))
+
+        with self.assertRaises(ValueError):
+            device.insert(0, "full")
+
+        # the caller's list of encoded locations is not modified
+        self.assertEqual(device.enc_locations[0], device.encode_message("l1"))
+
+    def test_updates_check_the_coordinates(self):
+        device = IntelDevice(3, 3, [], [], 0)
+        device.loc_grid = np.array([[1, 4, 7], [2, 5, 8], [3, 6, 9]])
+        device.coordinate_to_location = {(y, x): f"l{y}{x}" for y in range(3) for x in range(3)}
+
+        # negative coordinates count from the end, like in NumPy
+        self.assertEqual(device.update(-1, -1, 0), (0, 0))
+        self.assertTrue(np.all(np.diff(device.loc_grid, axis=0) >= 0) and np.all(np.diff(device.loc_grid, axis=1) >= 0))
+        self.assertEqual(device.coordinate_to_location[(0, 0)], "l22")
+
+        grid = device.loc_grid.copy()
+        for y, x in [(3, 0), (0, 3), (-4, 0), (0, -4)]:
+            with self.assertRaises(IndexError):
+                device.update(y, x, 5)
+            with self.assertRaises(IndexError):
+                device.delete(y, x)
+        np.testing.assert_array_equal(device.loc_grid, grid)
+
+    def test_search_instrumentation(self):
+        device = IntelDevice(3, 3, [], [], 0)
+        device.loc_grid = np.array([
+            [1, 4, 7],
+            [2, 5, 8],
+            [3, 6, 9]
+        ])
+        device.coordinate_to_location = {(y, x): f"l{y}{x}" for y in range(3) for x in range(3)}
+
+        # disabled by default
+        self.assertIsNone(device.stats)
+        device.start_search(9)
+        self.assertIsNone(device.stats)
+
+        stats = device.enable_stats()
+        device.start_search(5)
+        device.start_search(10, mode="iterative")
+        device.start_search(5)
+
+        first, second, third = stats.queries
+        self.assertEqual((first["cells_probed"], first["nodes"], first["max_depth"]), (1, 1, 0))
+        self.assertFalse(first["cached"])
+        self.assertEqual((second["cells_probed"], second["pruned"]), (2, 1))
+        self.assertTrue(third["cached"])
+        self.assertEqual(third["cells_probed"], 0)
+        self.assertEqual(stats.cells_probed, 3)
+        self.assertGreater(stats.wall_time, 0)
+
+        stats = device.enable_stats()
+        device.divconq_search(3, 0, 2, 0, 2)
+        self.assertEqual(stats.max_depth, 2)
+        self.assertIs(device.disable_stats(), stats)
+        self.assertIsNone(device.stats)
+
+    def test_partial_last_row(self):
+        device = IntelDevice(3, 1, [], [], 0)
+        codes = [1, 3, 5, 2, 4, 6, 7, 9]
+        device.enc_locations = [device.encode_message(f"l{code}") for code in codes]
+        device.enc_codes = [device.encode_message(str(code)) for code in codes]
+        device.fill_coordinate_to_loc()
+        device.fill_loc_grid()
+
+        # the extra codes get extra rows, the missing cells are empty (and keep the grid sorted)
+        empty = np.iinfo(np.int8).max
+        self.assertEqual(device.loc_grid.tolist(), [[1, 3, 5], [2, 4, 6], [7, 9, empty]])
+
+        for mode in SEARCH_MODES:
+            for code in codes:
+                self.assertEqual(device.start_search(code, mode=mode, min_cells=0) if mode == "parallel"
+                                 else device.start_search(code, mode=mode), device.encode_message(f"l{code}"))
+            device.search_cache.clear()
+            self.assertIsNone(device.start_search(empty, mode=mode))
+            self.assertIsNone(device.start_search(0, mode=mode))
+
+        self.assertEqual(device.batch_search([9, empty, 8]), [(2, 1), None, None])
+        self.assertEqual(device.range_count(5, 1000), 4)
+        coords, _ = device.nearest_values(100, k=2)
+        self.assertEqual(coords.tolist(), [[2, 1], [2, 0]])
+
+        # fewer codes than cells
+        device = IntelDevice(2, 2, [], [device.encode_message("-3")], 0)
+        device.fill_loc_grid()
+        self.assertEqual(device.loc_grid.tolist(), [[-3, empty], [empty, empty]])
+
+    def test_snapshot_restore(self):
+        device = IntelDevice(2, 2, [], [], 3)
+        device.enc_locations = [device.encode_message(name) for name in ["Leiden", "Delft", "Kraków"]]
+        device.enc_codes = [device.encode_message(str(code)) for code in [1, 300, 2]]
+        device.fill_coordinate_to_loc()
+        device.fill_loc_grid()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            device.save_snapshot(tmp)
+            restored = IntelDevice.load_snapshot(tmp)
+
+            self.assertIsInstance(restored.loc_grid, np.memmap)
+            self.assertEqual(restored.loc_grid.tolist(), device.loc_grid.tolist())
+            self.assertEqual(dict(restored.coordinate_to_location), dict(device.coordinate_to_location))
+            for code, name in [(1, "Leiden"), (300, "Delft"), (2, "Kraków")]:
+                self.assertEqual(restored.start_search(code), device.encode_message(name))
+            self.assertIsNone(restored.start_search(4))
+
+            # updating a restored device copies the memory-mapped data first
+            restored.update(0, 1, 5)
+            self.assertEqual(restored.start_search(5), device.encode_message("Delft"))
+            del restored
+
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                f.write('{"version": 0}')
+            with self.assertRaises(ValueError):
+                IntelDevice.load_snapshot(tmp)
+
+    def test_interrupted_snapshot_keeps_the_previous_one(self):
+        device = IntelDevice(2, 2, [], [], 3)
+        device.enc_locations = [device.encode_message(name) for name in "abcd"]
+        device.enc_codes = [device.encode_message(str(code)) for code in [1, 2, 3, 4]]
+        device.fill_coordinate_to_loc()
+        device.fill_loc_grid()
+
+        bigger = IntelDevice(3, 2, [], [], 3)
+        bigger.enc_locations = [bigger.encode_message(name) for name in "uvwxyz"]
+        bigger.enc_codes = [bigger.encode_message(str(code)) for code in range(10, 16)]
+        bigger.fill_coordinate_to_loc()
+        bigger.fill_loc_grid()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "snapshot")
+            device.save_snapshot(path)
+            # saving decodes the names without filling the lazy mapping's cache
+            self.assertEqual(device.coordinate_to_location.cache, [None] * 4)
+
+            save = np.save
+            def failing_save(file, array):
+                if str(file).endswith("grid.npy"):
+                    raise OSError("disk full")
+                save(file, array)
+
+            with mock.patch("numpy.save", failing_save), self.assertRaises(OSError):
+                bigger.save_snapshot(path)
+
+            restored = IntelDevice.load_snapshot(path, mmap=False)
+            self.assertEqual(restored.loc_grid.tolist(), [[1, 2], [3, 4]])
+            self.assertEqual(dict(restored.coordinate_to_location), dict(device.coordinate_to_location))
+            self.assertEqual(os.listdir(tmp), ["snapshot"])
+
+            bigger.save_snapshot(path)
+            self.assertEqual(IntelDevice.load_snapshot(path).loc_grid.tolist(), bigger.loc_grid.tolist())
+
+    def test_snapshot_does_not_replace_other_directories(self):
+        device = IntelDevice(2, 1, [], [], 3)
+        device.enc_locations = [device.encode_message(name) for name in "ab"]
+        device.enc_codes = [device.encode_message(str(code)) for code in [1, 2]]
+        device.fill_coordinate_to_loc()
+        device.fill_loc_grid()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "mydata")
+            os.makedirs(path)
+            with open(os.path.join(path, "important.txt"), "w") as f:
+                f.write("keep me")
+
+            with self.assertRaises(FileExistsError):
+                device.save_snapshot(path)
+            self.assertEqual(os.listdir(path), ["important.txt"])
+            self.assertEqual(sorted(os.listdir(tmp)), ["mydata"])
+
+            device.save_snapshot(path, overwrite=True)
+            self.assertNotIn("important.txt", os.listdir(path))
+            self.assertEqual(IntelDevice.load_snapshot(path).loc_grid.tolist(), [[1, 2]])
+
+
+class TestShardedIntelDevice(unittest.TestCase):
+
+    def make_shard(self, codes, width):
+        device = IntelDevice(width, len(codes) // width, [], [], 1)
+        device.enc_locations = [device.encode_message(f"l{code}") for code in codes]
+        device.enc_codes = [device.encode_message(str(code)) for code in codes]
+        device.fill_coordinate_to_loc()
+        device.fill_loc_grid()
+        return device
+
+    def test_queries_are_routed_to_candidate_shards(self):
+        sharded = ShardedIntelDevice(max_workers=2)
+        north = self.make_shard([1, 3, 2, 4], 2)
+        south = self.make_shard([10, 12, 11, 13, 14], 2)
+        overlap = self.make_shard([4, 30], 2)
+        self.assertEqual(sharded.add_shard(north, "north"), 0)
+        sharded.add_shard(south, "south")
+        sharded.add_shard(overlap)
+
+        self.assertEqual(sharded.lows.tolist(), [1, 10, 4])
+        self.assertEqual(sharded.highs.tolist(), [4, 14, 30])
+        self.assertEqual(sharded.candidate_shards(12).tolist(), [1, 2])
+
+        self.assertEqual(sharded.start_search(3), ("north", north.encode_message("l3")))
+        # the shards are searched in order and the search stops at the first hit
+        with mock.patch.object(overlap, "start_search", side_effect=AssertionError):
+            self.assertEqual(sharded.start_search(4), ("north", north.encode_message("l4")))
+        self.assertEqual(sharded.start_search(14), ("south", south.encode_message("l14")))
+        self.assertIsNone(sharded.start_search(20))
+
+        self.assertEqual(sharded.start_batch_search([30, 20, 2, 11]), [
+            ("2", overlap.encode_message("l30")), None,
+            ("north", north.encode_message("l2")), ("south", south.encode_message("l11"))
+        ])
+        sharded.close()
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_generated_grids_are_sorted(self):
+        grid = benchmark.generate_sorted_grid(20, 30, duplicate_density=0.5, rng=np.random.default_rng(1))
+        self.assertTrue(np.all(np.diff(grid, axis=0) >= 0) and np.all(np.diff(grid, axis=1) >= 0))
+        self.assertLess(len(np.unique(grid)), grid.size)
+
+        misses = benchmark.generate_queries(grid, "misses", 50, np.random.default_rng(1))
+        self.assertFalse(np.any(np.isin(misses, grid)))
+
+    def test_numpy_scans_match_naive_linear_scan(self):
+        grid = benchmark.generate_sorted_grid(6, 7, duplicate_density=0.3, rng=np.random.default_rng(2))
+        values = list(range(int(grid.min()) - 1, int(grid.max()) + 2))
+        expected = [benchmark.naive_linear_scan(grid, value) for value in values]
+
+        self.assertEqual([benchmark.numpy_linear_scan(grid, value) for value in values], expected)
+        self.assertEqual(benchmark.numpy_batch_scan(grid, values, chunk_size=4), expected)
+
+    def test_run_benchmark_and_growth_exponents(self):
+        results = benchmark.run_benchmark([(8, 8), (16, 16), (32, 32)], distributions=["misses"],
+                                          num_queries=5, repeats=1)
+        self.assertEqual({row["engine"] for row in results}, set(benchmark.ENGINES) | set(benchmark.BATCH_ENGINES))
+        # the parallel search and batch_search do not count their cells
+        for row in results:
+            self.assertEqual(row["mean_cells_probed"] is None, row["engine"] in ("parallel", "batch_search"))
+
+        exponents = {row["engine"]: row["exponent"]
+                     for row in benchmark.fit_growth_exponents(results, "mean_cells_probed")}
+        # a miss scans the full grid
+        self.assertAlmostEqual(exponents["naive_linear_scan"], 1.0)
+        self.assertLess(exponents["iterative"], 1.0)
+
+
+class TestIntelServer(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrent_clients_are_batched(self):
+        device = IntelDevice(2, 2, [], [], 1)
+        device.enc_locations = [device.encode_message(name) for name in ["a", "b", "c", "d"]]
+        device.enc_codes = [device.encode_message(str(code)) for code in [1, 3, 2, 4]]
+        device.fill_coordinate_to_loc()
+        device.fill_loc_grid()
+
+        batch_sizes = []
+        batch_search = device.batch_search
+
+        def counting_batch_search(values):
+            batch_sizes.append(len(values))
+            return batch_search(values)
+
+        device.batch_search = counting_batch_search
+
+        server = IntelServer(device, batch_window=0.05)
+        listener = await server.start(host="127.0.0.1", port=0)
+        port = listener.sockets[0].getsockname()[1]
+
+        async def client(values):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write("".join(f"{value}\n" for value in values).encode())
+            await writer.drain()
+            answers = [(await reader.readline()).decode().strip() for _ in values]
+            writer.close()
+            return answers
+
+        async with listener:
+            answers = await asyncio.gather(client([1, 4]), client([3, 7]), client([2]))
+
+            self.assertEqual(answers, [
+                [device.encode_message("a"), device.encode_message("d")],
+                [device.encode_message("b"), "None"],
+                [device.encode_message("c")]
+            ])
+            self.assertEqual(batch_sizes, [5])
+
+            # a value that does not fit in int64 is rejected before it joins the batch of the other clients
+            batch_sizes.clear()
+            answers = await asyncio.gather(client([1, 4]), client(["99999999999999999999999", "x", 2]))
+            self.assertEqual(answers, [
+                [device.encode_message("a"), device.encode_message("d")],
+                ["ERROR invalid value", "ERROR invalid value", device.encode_message("c")]
+            ])
+            self.assertEqual(batch_sizes, [3])
+        server.batcher.cancel()
+
+    async def test_answers_match_start_search(self):
+        codes = [1, 1, 2, 2, 1, 2, 2, 3, 2, 2, 3, 3, 2, 3, 3, 3]
+        device = IntelDevice(4, 4, [], [], 1)
+        device.enc_locations = [device.encode_message(f"l{index}") for index in range(len(codes))]
+        device.enc_codes = [device.encode_message(str(code)) for code in codes]
+        device.fill_coordinate_to_loc()
+        device.fill_loc_grid()
+        values = [1, 2, 3, 4, 2]
+        # with duplicate codes, start_search and the vectorised batch lookup can pick different cells
+        expected = [device.start_search(value) for value in values]
+        self.assertNotEqual(expected, device.start_batch_search(values))
+
+        server = IntelServer(device, batch_window=0.05)
+        device.search_cache.clear()
+        before = device.cache_info()
+        self.assertEqual(await asyncio.gather(*(server.query(value) for value in values)), expected)
+        # every value that occurs is searched once, the value that does not occur is not searched at all
+        self.assertEqual(device.cache_info()["misses"] - before["misses"], 3)
+        # later queries are answered from the start_search cache
+        self.assertEqual(await server.query(3), expected[2])
+        self.assertEqual(device.cache_info()["hits"] - before["hits"], 1)
+        server.batcher.cancel()
+
+        server = IntelServer(device, batch_window=0.05, exact=False)
+        self.assertEqual(await asyncio.gather(*(server.query(value) for value in values)),
+                         device.start_batch_search(values))
+        server.batcher.cancel()
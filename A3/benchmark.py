@@ -0,0 +1,149 @@
+import argparse
+import csv
+import json
+import time
+import typing
+
+import numpy as np
+
+from dynprog import DroneExtinguisher, DP_METHODS
+
+
+def generate_instance(num_bags: int, num_drones: int, liter_budget_per_day: int = 100,
+                      rng: np.random.Generator = None) -> typing.Dict:
+    """
+    Generates the arguments of a random DroneExtinguisher (bags of 1-39 liters within 10 km of the forest).
+
+    :param num_bags: The number of water bags
+    :param num_drones: The number of drones
+    :param liter_budget_per_day: The daily budget in liters
+    :param rng: The random generator to use
+
+    Returns:
+      A dictionary with the keyword arguments of DroneExtinguisher
+    """
+
+    rng = rng if rng is not None else np.random.default_rng()
+    return {
+        "forest_location": (0, 0),
+        "bags": rng.integers(1, 40, size=num_bags).tolist(),
+        "bag_locations": [tuple(location) for location in rng.uniform(0, 10, size=(num_bags, 2))],
+        "liter_cost_per_km": 1,
+        "liter_budget_per_day": liter_budget_per_day,
+        "usage_cost": rng.integers(0, 30, size=(num_bags, num_drones)),
+    }
+
+
+def solve(instance: typing.Dict, method: str) -> DroneExtinguisher:
+    de = DroneExtinguisher(**instance)
+    de.fill_travel_costs_in_liters()
+    de.dynamic_programming(method=method)
+    return de
+
+
+def run_benchmark(sizes: typing.List[int], methods: typing.List[str] = DP_METHODS, num_drones: int = 3,
+                  liter_budget_per_day: int = 100, repeats: int = 5, seed: int = 0,
+                  reference_max_bags: int = 400) -> typing.List[typing.Dict]:
+    """
+    Times every dynamic programming method on random instances of every size. The timings include filling the
+    travel costs and are repeated; the median (and minimum) time per solve is reported.
+
+    :param sizes: The numbers of bags of the generated instances
+    :param methods: The dynamic programming methods (see DP_METHODS) to run
+    :param num_drones: The number of drones of the generated instances
+    :param liter_budget_per_day: The daily budget of the generated instances (bounds the number of bags per day)
+    :param repeats: The number of timed runs
+    :param seed: The seed of the random generator
+    :param reference_max_bags: The reference implementation is quadratic in the number of bags and drones with a
+                               method call per cell, so it is skipped on larger instances
+
+    Returns:
+      A list of result rows (dictionaries)
+    """
+
+    rng = np.random.default_rng(seed)
+    results = []
+    for num_bags in sizes:
+        instance = generate_instance(num_bags, num_drones, liter_budget_per_day, rng)
+        for method in methods:
+            if method == "reference" and num_bags > reference_max_bags:
+                continue
+
+            times = []
+            for _ in range(repeats):
+                start_time = time.perf_counter()
+                de = solve(instance, method)
+                times.append(time.perf_counter() - start_time)
+
+            results.append({
+                "method": method, "num_bags": num_bags, "num_drones": num_drones,
+                "liter_budget_per_day": liter_budget_per_day, "repeats": repeats,
+                "median_time": float(np.median(times)), "min_time": float(np.min(times)),
+                "lowest_cost": float(de.optimal_cost[-1][-1]),
+            })
+    return results
+
+
+def fit_growth_exponents(results: typing.List[typing.Dict], metric: str = "median_time") -> typing.List[typing.Dict]:
+    """
+    Fits metric ~ c * num_bags^k for every method with a least-squares line in log-log space.
+
+    Returns:
+      A list of dictionaries with the method and fitted exponent
+    """
+
+    exponents = []
+    groups = {}
+    for row in results:
+        groups.setdefault(row["method"], []).append(row)
+    for method, rows in groups.items():
+        sizes = np.array([row["num_bags"] for row in rows], dtype=float)
+        values = np.array([row[metric] for row in rows], dtype=float)
+        usable = values > 0
+        if len(np.unique(sizes[usable])) < 2:
+            continue
+        exponent = np.polyfit(np.log(sizes[usable]), np.log(values[usable]), 1)[0]
+        exponents.append({"method": method, "metric": metric, "exponent": float(exponent)})
+    return exponents
+
+
+def write_csv(path: str, results: typing.List[typing.Dict]):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main(argv: typing.List[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the DroneExtinguisher dynamic programming methods")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 200, 400, 800], help="numbers of bags")
+    parser.add_argument("--methods", nargs="+", choices=DP_METHODS, default=list(DP_METHODS))
+    parser.add_argument("--drones", type=int, default=3, help="number of drones")
+    parser.add_argument("--budget", type=int, default=100, help="daily budget in liters")
+    parser.add_argument("--repeats", type=int, default=3, help="number of timed runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reference-max-bags", type=int, default=400,
+                        help="skip the reference implementation on larger instances")
+    parser.add_argument("--json", help="write the results to this JSON file")
+    parser.add_argument("--csv", help="write the results to this CSV file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.sizes, args.methods, args.drones, args.budget, args.repeats, args.seed,
+                            args.reference_max_bags)
+    exponents = fit_growth_exponents(results)
+
+    for row in results:
+        print(f"{row['method']:>10} {row['num_bags']:>8} bags {row['median_time'] * 1e3:10.2f} ms "
+              f"(lowest cost {row['lowest_cost']:.0f})")
+    for row in exponents:
+        print(f"{row['method']:>10} {row['metric']:>11} ~ bags^{row['exponent']:.2f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"results": results, "exponents": exponents}, f, indent=2)
+    if args.csv:
+        write_csv(args.csv, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,214 @@
+import concurrent.futures
 import math
 import numpy as np
 import typing
 
 
+def _append_rows(array: np.ndarray, buffer: typing.Optional[np.ndarray],
+                 rows: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """
+    Appends rows to array, which is (or is not yet) the leading part buffer[:len(array)] of a larger buffer. The buffer
+    grows by doubling, so that appending costs amortised O(len(rows)) instead of copying the whole array every time.
+
+    Returns:
+      The tuple (array with the rows appended, its buffer)
+    """
+    rows = np.asarray(rows)
+    dtype = np.result_type(array, rows)
+    rows = rows.reshape((-1,) + array.shape[1:])
+    n, m = len(array), len(array) + len(rows)
+    if buffer is None or array.base is not buffer or len(buffer) < m or buffer.dtype != dtype:
+        buffer = np.empty((max(m, 2 * n),) + array.shape[1:], dtype=dtype)
+        buffer[:n] = array
+    buffer[n:m] = rows
+    return buffer[:m], buffer
+
+
+def _day_idle_costs(budget, liters, final_day) -> np.ndarray:
+    """
+    Vectorised version of DroneExtinguisher.compute_idle_cost: the idle cost of days on which the given liters are
+    used, i.e. the cubed idle time (budget - liters), np.inf if the day does not fit in the budget and 0 on the final
+    day. The arguments are broadcast against each other (e.g. one budget per row and one day per column); final_day is
+    a bool or a bool array.
+    """
+    idle_time = budget - liters
+    idle_cost = idle_time ** 3
+    idle_cost[idle_time < 0] = np.inf
+    # no idle cost on the final day (skipping the mask for the other days, as this runs once per column in _lean_row)
+    if isinstance(final_day, np.ndarray) or final_day:
+        idle_cost[final_day & (idle_time > 0)] = 0
+    return idle_cost
+
+
+class BandedIdleCost:
+    def __init__(self, num_bags: int, first: np.ndarray = None):
+        """
+        Compressed storage of the idle costs idle_cost[j, i] of emptying bags[j:i+1] on one day, with the same (j, i)
+        access semantics as a dense num_bags x num_bags matrix. Only the band of feasible days is stored: for every end
+        bag i, the values for the start bags j = first[i], ..., i are kept in one flat buffer (starting at offsets[i]).
+        Days that start before first[i] do not fit in the daily budget and read as np.inf, entries below the diagonal
+        (j > i) read as -1 (never filled) and unfilled entries in the band read as -1 as well. Writes outside of the band
+        are ignored. The memory thus scales with the number of bags times the window width instead of quadratically.
+
+        :param num_bags: the number of bags
+        :param first: first[i] is the smallest feasible start bag of end bag i (by default all days are feasible)
+        """
+        self.num_bags = num_bags
+        self._buffers = {}
+        self.set_band(first if first is not None else np.zeros(num_bags, dtype=np.int64))
+
+    def set_band(self, first: np.ndarray):
+        """
+        (Re)allocates the buffer for the band given by first (see __init__); all stored values are reset to -1.
+        """
+        self.first = np.asarray(first, dtype=np.int64)
+        lengths = np.maximum(np.arange(1, self.num_bags + 1) - self.first, 0)
+        self.offsets = np.zeros(self.num_bags + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+        self.values = -1 * np.ones(self.offsets[-1])
+
+    def extend(self, first: np.ndarray):
+        """
+        Adds end bags num_bags, num_bags + 1, ... with the band given by first (the smallest feasible start bag of each
+        new end bag). The stored values of the existing bags are kept, the new values are -1.
+        """
+        first = np.asarray(first, dtype=np.int64)
+        lengths = np.maximum(np.arange(self.num_bags + 1, self.num_bags + len(first) + 1) - first, 0)
+        self.first, self._buffers["first"] = _append_rows(self.first, self._buffers.get("first"), first)
+        self.offsets, self._buffers["offsets"] = _append_rows(self.offsets, self._buffers.get("offsets"),
+                                                              self.offsets[-1] + np.cumsum(lengths))
+        self.values, self._buffers["values"] = _append_rows(self.values, self._buffers.get("values"),
+                                                            -1 * np.ones(lengths.sum()))
+        self.num_bags += len(first)
+
+    @property
+    def shape(self) -> typing.Tuple[int, int]:
+        return self.num_bags, self.num_bags
+
+    def _check_index(self, idx: int) -> int:
+        # like NumPy, negative indices count from the end and indices out of range raise an IndexError
+        if not -self.num_bags <= idx < self.num_bags:
+            raise IndexError(f"index {idx} is out of bounds for {self.num_bags} bags")
+        return idx % self.num_bags
+
+    def __getitem__(self, key: typing.Tuple[int, int]) -> float:
+        j, i = self._check_index(key[0]), self._check_index(key[1])
+        if j > i:
+            return -1.0
+        if j < self.first[i]:
+            return np.inf
+        return self.values[self.offsets[i] + j - self.first[i]]
+
+    def __setitem__(self, key: typing.Tuple[int, int], value: float):
+        j, i = self._check_index(key[0]), self._check_index(key[1])
+        if self.first[i] <= j <= i:
+            self.values[self.offsets[i] + j - self.first[i]] = value
+
+    def column(self, i: int, first_start: int = 0) -> np.ndarray:
+        """
+        Returns the idle costs idle_cost[j, i] for j = first_start, ..., i as an array.
+        """
+        column = np.full(i + 1 - first_start, np.inf)
+        band_start = max(self.first[i], first_start)
+        column[band_start - first_start:] = self.values[self.offsets[i] + band_start - self.first[i]:self.offsets[i + 1]]
+        return column
+
+    def set_column(self, i: int, values: np.ndarray):
+        """
+        Stores the idle costs idle_cost[j, i] for the band j = first[i], ..., i.
+        """
+        self.values[self.offsets[i]:self.offsets[i + 1]] = values
+
+    def toarray(self) -> np.ndarray:
+        """
+        Returns the dense num_bags x num_bags matrix (only meant for small instances).
+        """
+        dense = -1 * np.ones((self.num_bags, self.num_bags))
+        for i in range(self.num_bags):
+            dense[:i + 1, i] = self.column(i)
+        return dense
+
+
+class BacktraceArray:
+    def __init__(self, num_bags: int, num_drones: int):
+        """
+        Compact storage of the backpointers backtrace[(i, k)] (the start bag of the day that ends with bag i using the
+        drones up to k, or -1) in a (num_bags, num_drones) integer array instead of a dictionary. The dtype is the
+        smallest signed integer type that holds all bag indices (int16 up to 32767 bags, then int32).
+        """
+        self.num_drones = num_drones
+        self.array = np.full((num_bags, num_drones), -1, dtype=self._dtype(num_bags))
+        self._buffer = None
+
+    @staticmethod
+    def _dtype(num_bags: int) -> np.dtype:
+        for dtype in (np.int16, np.int32):
+            if num_bags <= np.iinfo(dtype).max:
+                return np.dtype(dtype)
+        return np.dtype(np.int64)
+
+    def extend(self, num_new_bags: int):
+        """
+        Adds rows for num_new_bags bags (filled with -1), widening the dtype if needed.
+        """
+        dtype = self._dtype(len(self.array) + num_new_bags)
+        if dtype != self.array.dtype:
+            self.array, self._buffer = self.array.astype(dtype), None
+        self.array, self._buffer = _append_rows(self.array, self._buffer,
+                                                np.full((num_new_bags, self.num_drones), -1, dtype=dtype))
+
+    def __getitem__(self, key: typing.Tuple[int, int]) -> int:
+        return int(self.array[key])
+
+    def __setitem__(self, key: typing.Tuple[int, int], value: int):
+        self.array[key] = value
+
+    def __len__(self) -> int:
+        return self.array.size
+
+    @property
+    def nbytes(self) -> int:
+        return self.array.nbytes
+
+
+class CheckpointedBacktrace:
+    def __init__(self, extinguisher: "DroneExtinguisher", first: np.ndarray,
+                 checkpoints: typing.Dict[int, np.ndarray], segment_size: int):
+        """
+        Backpointers of the "checkpoint" backtrace mode (see DroneExtinguisher._dynamic_programming_lean). Only the
+        ring buffers of optimal_cost rows at the start of every segment of segment_size end bags are kept. Reading a
+        backpointer recomputes the backpointers of its segment from the checkpoint; backtrace_solution walks the
+        bags backwards, so every segment is recomputed once and only one segment is held in memory.
+        """
+        self.extinguisher = extinguisher
+        self.first = first
+        self.checkpoints = checkpoints
+        self.segment_size = segment_size
+        self._segment = None
+        self._segment_start = -1
+
+    def _recompute_segment(self, start: int):
+        de = self.extinguisher
+        rows = self.checkpoints[start].copy()
+        stop = min(start + self.segment_size, de.num_bags)
+        segment = np.empty((stop - start, de.num_drones), dtype=BacktraceArray._dtype(de.num_bags))
+        for i in range(start, stop):
+            rows[(i + 1) % len(rows)], segment[i - start] = de._lean_row(i, self.first, rows)
+        self._segment, self._segment_start = segment, start
+
+    def __getitem__(self, key: typing.Tuple[int, int]) -> int:
+        i, k = key
+        start = i - i % self.segment_size
+        if start != self._segment_start:
+            self._recompute_segment(start)
+        return int(self._segment[i - start, k])
+
+    @property
+    def nbytes(self) -> int:
+        checkpoints = sum(rows.nbytes for rows in self.checkpoints.values())
+        return checkpoints + (self._segment.nbytes if self._segment is not None else 0)
+
+
 class DroneExtinguisher:
     def __init__(self, forest_location: typing.Tuple[float, float], bags: typing.List[int],
                  bag_locations: typing.List[typing.Tuple[float, float]],
@@ -35,9 +241,20 @@ class DroneExtinguisher:
         # that could have been emptied in the forest (measured in integers)
         self.travel_costs_in_liters = []
 
-        # idle_cost[i,j] is the amount of time measured in liters that we are idle on a day if we 
-        # decide to empty bags[i:j+1] on that day
-        self.idle_cost = -1 * np.ones((self.num_bags, self.num_bags))
+        # prefix sums so that every sequence cost is an O(1) difference:
+        # liter_prefix_sums[i] = sum of bags[:i] + travel_costs_in_liters[:i] (updated by fill_travel_costs_in_liters)
+        # usage_prefix_sums[i,k] = sum of usage_cost[:i,k]
+        self.liter_prefix_sums = np.concatenate(([0.0], np.cumsum(np.asarray(self.bags, dtype=float))))
+        self.usage_prefix_sums = None
+        if usage_cost is not None:
+            self.usage_prefix_sums = np.zeros((len(self.usage_cost) + 1, self.num_drones))
+            np.cumsum(self.usage_cost, axis=0, out=self.usage_prefix_sums[1:])
+
+        # idle_cost[i,j] is the cost of the time measured in liters that we are idle on a day if we 
+        # decide to empty bags[i:j+1] on that day. Only the band of days that fit in the daily budget
+        # is stored (see BandedIdleCost), the band is rebuilt when the budget or the prefix sums change
+        self.idle_cost = BandedIdleCost(self.num_bags, self._idle_cost_band())
+        self._idle_cost_band_source = (self.liter_budget_per_day, self.liter_prefix_sums)
 
         # optimal_cost[i,k] is the optimal cost of emptying water bags[:i] with drones[:k+1]
         # this has to be filled in using the dynamic programming function
@@ -47,6 +264,11 @@ class DroneExtinguisher:
         # reconstructing what bags we empty on every day in the forest
         self.backtrace_memory = dict()
 
+        # the number of bags for which optimal_cost and backtrace_memory have been filled in (see add_bags), and the
+        # buffers that the arrays and lists extended by add_bags grow into
+        self.solved_bags = 0
+        self._buffers = {}
+
     @staticmethod
     def compute_euclidean_distance(point1: typing.Tuple[float, float], point2: typing.Tuple[float, float]) -> float:
         """
@@ -73,15 +295,42 @@ class DroneExtinguisher:
                 
         The function does not return anything.  
         """
-        for i in range(len(self.bag_locations)):
-            # calculate distance between forest/drone housing and bag location
-            distance = self.compute_euclidean_distance(self.forest_location, self.bag_locations[i])
+        costs = self.compute_travel_costs_in_liters(self.bag_locations)
+        self.travel_costs_in_liters.extend(costs.tolist())
 
-            # calculate cost in liters using liter_cost_per_km
-            cost_in_liters = np.ceil(distance * self.liter_cost_per_km * 2)
+        # update the prefix sums of the liters per bag (contents + travel cost)
+        liters = np.asarray(self.bags, dtype=float)
+        travel = np.asarray(self.travel_costs_in_liters[:self.num_bags], dtype=float)
+        liters[:len(travel)] += travel
+        self.liter_prefix_sums = np.concatenate(([0.0], np.cumsum(liters)))
+        self._refresh_idle_cost_band()
 
-            # add cost to travel_costs_in_liters
-            self.travel_costs_in_liters.append(cost_in_liters)
+    def compute_travel_costs_in_liters(self, bag_locations: typing.List[typing.Tuple[float, float]]) -> np.ndarray:
+        """
+        Computes the cost of traveling from the forest to every bag location and back in liters, rounded up, for all
+        locations at once. The distances are computed as sqrt(dx ** 2 + dy ** 2) like compute_euclidean_distance
+        (np.hypot may differ in the last bit, which can change the rounded up cost), so the costs are identical to
+        rounding compute_euclidean_distance per bag.
+
+        :param bag_locations: list (or (n, 2) array) of the locations of the water bags
+
+        Returns:
+          An integer array with the travel cost in liters per bag location
+        """
+        distances = self.compute_distances_to_forest(self.forest_location, bag_locations)
+        return np.ceil(distances * self.liter_cost_per_km * 2).astype(np.int64)
+
+    @staticmethod
+    def compute_distances_to_forest(forest_location: typing.Tuple[float, float],
+                                    bag_locations: typing.List[typing.Tuple[float, float]]) -> np.ndarray:
+        """
+        A static method that computes the Euclidean distance from the forest to every bag location at once
+        (see compute_travel_costs_in_liters).
+        """
+        locations = np.asarray(bag_locations, dtype=float).reshape(-1, 2)
+        dx = forest_location[0] - locations[:, 0]
+        dy = forest_location[1] - locations[:, 1]
+        return np.sqrt(dx ** 2 + dy ** 2)
 
     def compute_sequence_idle_time_in_liters(self, i, j):
         """
@@ -100,25 +349,18 @@ class DroneExtinguisher:
           int: the amount of time (measured in liters) that we are idle on the day   
         """
         # Check if i and j are valid indices
-        try:
-
-            if self.idle_cost[i, j] != -1:
-                return self.idle_cost[i, j]
-
-            # Compute the amount of water in the bags
-            total_water = sum(self.bags[i:j + 1])
-
-            # Compute the total cost of transporting the bags to the forest and back
-            total_cost = sum(self.travel_costs_in_liters[i:j + 1])
-
-            # Compute the idle time
-            idle_time = self.liter_budget_per_day - (total_water + total_cost)
-
-        except IndexError:
+        if not (-self.num_bags <= i < self.num_bags and -self.num_bags <= j < self.num_bags):
             return np.inf
 
-        # Store the idle cost for later use
-        # self.idle_cost[i, j] = idle_time
+        # Compute the amount of water in the bags plus the total cost of transporting the bags to the
+        # forest and back, as a difference of the prefix sums
+        if 0 <= i <= j:
+            total_liters = self.liter_prefix_sums[j + 1] - self.liter_prefix_sums[i]
+        else:
+            total_liters = sum(self.bags[i:j + 1]) + sum(self.travel_costs_in_liters[i:j + 1])
+
+        # Compute the idle time
+        idle_time = self.liter_budget_per_day - total_liters
 
         return idle_time
 
@@ -172,6 +414,13 @@ class DroneExtinguisher:
         # If the drone index is larger than the number of drones, return np.inf as cost, same for bag range
         try:
 
+            if i > j:
+                return 0.0
+
+            # a difference of the prefix sums for a valid range of bags and drone
+            if 0 <= i and j < len(self.usage_cost) and -self.num_drones <= k < self.num_drones:
+                return self.usage_prefix_sums[j + 1, k] - self.usage_prefix_sums[i, k]
+
             usage_cost = 0.0
             for bag_idx in range(i, j + 1):
                 usage_cost += self.usage_cost[bag_idx][k]
@@ -180,12 +429,65 @@ class DroneExtinguisher:
         except IndexError:
             return 0.0
 
-    def dynamic_programming(self):
+    def dynamic_programming(self, method: str = "reference", backtrace: str = "dict"):
         """
         The function that uses dynamic programming to solve the problem: compute the optimal way of emptying bags in the forest
         per day and store a solution that can be used in the backtracing function below (if you want to do that assignment part). 
         In this function, we fill the memory structures self.idle_cost and self.optimal_cost making use of functions defined above. 
         This function does not return anything. 
+
+        :param method: the implementation to use, one of DP_METHODS. "reference" is the readable loop implementation below,
+                       "vectorized" computes all candidates for an end bag with NumPy (see _dynamic_programming_vectorized),
+                       "window" only considers the start bags that fit in the daily budget (see _dynamic_programming_window),
+                       "monotone" uses the quadrangle inequality of the costs (see _dynamic_programming_monotone),
+                       "kernel" runs the loops of the reference on plain lists (see _dp_kernel).
+                       All methods give identical results.
+        :param backtrace: how the backpointers are kept, one of BACKTRACE_MODES. "dict" is the dictionary keyed by
+                          (i, k), "array" a compact integer array (see BacktraceArray). "none" and "checkpoint" are the
+                          memory-lean modes (see _dynamic_programming_lean): they keep only the rows of optimal_cost in
+                          the sliding window, so that afterwards optimal_cost only holds its last row (lowest_cost still
+                          works). "none" keeps no backpointers, "checkpoint" keeps checkpoints from which
+                          backtrace_solution recomputes them (see CheckpointedBacktrace). The lean modes ignore method.
+        """
+        if backtrace not in BACKTRACE_MODES:
+            raise ValueError(f"unknown backtrace mode {backtrace!r}, expected one of {BACKTRACE_MODES}")
+        # liter_budget_per_day may have been changed since the band of the idle costs was built
+        self._refresh_idle_cost_band()
+        if backtrace in ("none", "checkpoint") and self._window_applies():
+            self._dynamic_programming_lean(checkpoint=backtrace == "checkpoint")
+            self.solved_bags = 0
+            return
+
+        self.optimal_cost = np.zeros((self.num_bags + 1, self.num_drones))
+        self.backtrace_memory = dict() if backtrace == "dict" else BacktraceArray(self.num_bags, self.num_drones)
+        if method == "reference":
+            self._dynamic_programming_reference()
+        elif method == "vectorized":
+            self._dynamic_programming_vectorized()
+        elif method == "window":
+            self._dynamic_programming_window()
+        elif method == "monotone":
+            self._dynamic_programming_monotone()
+        elif method == "kernel":
+            self._dynamic_programming_kernel()
+        else:
+            raise ValueError(f"unknown dynamic programming method {method!r}, expected one of {DP_METHODS}")
+        self.solved_bags = self.num_bags
+        # the lean modes do not apply (see _window_applies), drop the backpointers that were needed to solve
+        if backtrace == "none":
+            self.backtrace_memory = None
+
+    def _window_applies(self) -> bool:
+        """
+        Returns whether the sliding window can be used: the liters per bag are not negative and there are usage
+        costs for every bag.
+        """
+        return not np.any(np.diff(self.liter_prefix_sums) < 0) and self.usage_prefix_sums is not None \
+            and len(self.usage_cost) >= self.num_bags
+
+    def _dynamic_programming_reference(self):
+        """
+        The reference implementation of the dynamic programming, calling the functions defined above for every cell.
         """
         # Loop over all the bags
         for i in range(self.num_bags):
@@ -226,6 +528,399 @@ class DroneExtinguisher:
                 self.backtrace_memory[(i, k)] = min_cost_idx
 
 
+    def _fill_idle_cost_vectorized(self, start: int = 0):
+        """
+        Fills the band of self.idle_cost (idle_cost[j, i] for the feasible days j..i) of the end bags start, ...,
+        num_bags - 1 in one go from the prefix sums, with the same rules as compute_idle_cost.
+        """
+        idle_cost = self.idle_cost
+        offsets = idle_cost.offsets
+        ends = np.repeat(np.arange(start, self.num_bags), np.diff(offsets[start:]))
+        starts = np.arange(offsets[start], offsets[-1]) - offsets[ends] + idle_cost.first[ends]
+        liters = self.liter_prefix_sums[ends + 1] - self.liter_prefix_sums[starts]
+        idle_cost.values[offsets[start]:] = _day_idle_costs(self.liter_budget_per_day, liters, ends == self.num_bags - 1)
+
+    def _dynamic_programming_vectorized(self):
+        """
+        Vectorised version of the dynamic programming: the idle costs are computed in one go and, for every end bag i,
+        all (start bag, drone) candidates are evaluated at once by _fill_optimal_cost_row.
+        """
+        # the usage costs come from the prefix sums; the reference handles usage_cost with fewer rows than bags
+        if self.usage_prefix_sums is None or len(self.usage_cost) < self.num_bags:
+            self._dynamic_programming_reference()
+            return
+
+        self._fill_idle_cost_vectorized()
+        for i in range(self.num_bags):
+            self._fill_optimal_cost_row(i, 0)
+
+    def _fill_optimal_cost_row(self, i: int, first_start: int):
+        """
+        Fills self.optimal_cost[i+1, :] and self.backtrace_memory[(i, k)] for end bag i, considering the start bags
+        j = first_start, ..., i. The (j, l) candidate matrix
+        optimal_cost[j, l] + idle_cost[j, i] + usage cost of bags[j:i+1] with drone l
+        is computed as one NumPy expression. The best start bag per drone is found with argmin, after which a running
+        minimum over the drones gives optimal_cost[i+1, k] for every k. Ties are broken like in the reference
+        implementation (the smallest start bag j wins).
+
+        :param i: the index of the last bag emptied on the day
+        :param first_start: the smallest start bag j that is considered
+        """
+        usage_prefix = self.usage_prefix_sums
+        starts = slice(first_start, i + 1)
+
+        # candidates[j, l] = optimal cost of the bags before j + idle cost of day j..i + usage of drone l on day j..i
+        candidates = self.optimal_cost[starts, :] + self.idle_cost.column(i, first_start)[:, None] \
+            + (usage_prefix[i + 1, :] - usage_prefix[starts, :])
+
+        self._store_optimal_cost_row(i, *self._best_start_per_drone(candidates, first_start))
+
+    @staticmethod
+    def _best_start_per_drone(candidates: np.ndarray, first_start: int) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the best start bag per drone and its cost for a (start bag - first_start, drone) candidate matrix
+        (np.argmin returns the first, i.e. smallest, start bag); -1 and np.inf if there are no candidates.
+        """
+        num_drones = candidates.shape[1]
+        if len(candidates):
+            best_start = first_start + np.argmin(candidates, axis=0)
+            best_cost = candidates[best_start - first_start, np.arange(num_drones)]
+        else:
+            best_start = np.full(num_drones, -1)
+            best_cost = np.full(num_drones, np.inf)
+        return best_start, best_cost
+
+    @staticmethod
+    def _running_min_over_drones(best_start: np.ndarray,
+                                 best_cost: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Given the best start bag best_start[l] and its cost best_cost[l] for every drone l, returns the row
+        optimal_cost[i+1, :] and the backpointers of all drones k (the best over the drones l <= k).
+        """
+        cost_row = np.empty(len(best_cost))
+        start_row = np.empty(len(best_cost), dtype=np.int64)
+        min_cost = np.inf
+        min_cost_idx = -1
+        for k in range(len(best_cost)):
+            if best_cost[k] < min_cost or (best_cost[k] == min_cost and best_start[k] < min_cost_idx):
+                min_cost = best_cost[k]
+                min_cost_idx = best_start[k]
+            cost_row[k] = min_cost
+            start_row[k] = min_cost_idx
+        return cost_row, start_row
+
+    def _store_optimal_cost_row(self, i: int, best_start: np.ndarray, best_cost: np.ndarray):
+        """
+        Stores self.optimal_cost[i+1, :] and self.backtrace_memory[(i, k)] for end bag i, given the best start bag
+        best_start[l] and its cost best_cost[l] for every drone l.
+        """
+        cost_row, start_row = self._running_min_over_drones(best_start, best_cost)
+        self.optimal_cost[i + 1] = cost_row
+        for k in range(self.num_drones):
+            self.backtrace_memory[(i, k)] = int(start_row[k])
+
+    def _refresh_idle_cost_band(self) -> bool:
+        """
+        Rebuilds the band of self.idle_cost (resetting its values) if liter_budget_per_day or the prefix sums changed
+        since it was built.
+
+        Returns:
+          Whether the band was rebuilt
+        """
+        budget, prefix_sums = self._idle_cost_band_source
+        if budget == self.liter_budget_per_day and prefix_sums is self.liter_prefix_sums \
+                and self.idle_cost.num_bags == self.num_bags:
+            return False
+        self.idle_cost = BandedIdleCost(self.num_bags, self._idle_cost_band())
+        self._idle_cost_band_source = (self.liter_budget_per_day, self.liter_prefix_sums)
+        return True
+
+    def _idle_cost_band(self) -> np.ndarray:
+        """
+        Returns the band of feasible days for self.idle_cost (see BandedIdleCost). If some bag has a negative amount of
+        liters the feasible days are not contiguous, in which case the full upper triangle is used.
+        """
+        if np.any(np.diff(self.liter_prefix_sums) < 0):
+            return np.zeros(self.num_bags, dtype=np.int64)
+        return self.feasible_start_bags()
+
+    def feasible_start_bags(self, start: int = 0, first_start: int = 0) -> np.ndarray:
+        """
+        Computes for every end bag i the smallest start bag j such that bags[j:i+1] can be emptied on one day
+        (the idle time is not negative). As the liters per bag are not negative, the prefix sums are non-decreasing,
+        so the feasible start bags of i are exactly j = first[i], ..., i and first[i] never decreases with i.
+        This allows two pointers to compute all windows in O(n).
+
+        :param start: the first end bag to compute the window for (add_bags only computes the windows of the new bags)
+        :param first_start: a lower bound on first[start], e.g. first[start - 1]
+
+        Returns:
+          An array first with first[i - start] the smallest feasible start bag of end bag i (first[i - start] = i + 1
+          if even bags[i] alone does not fit in a day)
+        """
+        prefix = self.liter_prefix_sums
+        first = np.empty(self.num_bags - start, dtype=np.int64)
+        j = first_start
+        for i in range(start, self.num_bags):
+            # move the left pointer until the day j..i fits in the budget
+            while j <= i and self.liter_budget_per_day - (prefix[i + 1] - prefix[j]) < 0:
+                j += 1
+            first[i - start] = j
+        return first
+
+    def _dynamic_programming_window(self):
+        """
+        Sliding-window version of the vectorised dynamic programming. Any day j..i whose liters plus travel exceed the
+        daily budget has infinite idle cost, so only the feasible start bags (see feasible_start_bags) are considered
+        and only their idle costs are computed. This takes O(n * w * d) time for windows of at most w bags instead of
+        being quadratic in the number of bags.
+        """
+        # the window relies on non-negative liters per bag; otherwise, and for usage_cost with fewer rows than bags,
+        # use the other implementations
+        if np.any(np.diff(self.liter_prefix_sums) < 0):
+            self._dynamic_programming_vectorized()
+            return
+        if self.usage_prefix_sums is None or len(self.usage_cost) < self.num_bags:
+            self._dynamic_programming_reference()
+            return
+
+        self._fill_window_rows(0)
+
+    def _fill_window_rows(self, start: int):
+        """
+        Fills the idle costs and optimal_cost rows of the end bags start, ..., num_bags - 1 with the sliding window,
+        assuming that the rows of the bags before start are filled in and that self.idle_cost has the band of
+        feasible_start_bags.
+        """
+        self._fill_idle_cost_vectorized(start)
+        first = self.idle_cost.first
+        for i in range(start, self.num_bags):
+            self._fill_optimal_cost_row(i, first[i])
+
+    def _dynamic_programming_monotone(self):
+        """
+        Dynamic programming that uses the quadrangle inequality of the day costs. For a drone l, the cost of the day
+        j..i is w(j, i) = h(load(j, i)) + usage of drone l on bags[j:i+1], where load(j, i) is the prefix sum difference
+        of the liters and h(x) = (budget - x) ** 3 (np.inf above the budget) is convex. With non-negative liters this
+        gives w(a, c) + w(b, d) <= w(a, d) + w(b, c) for a <= b <= c <= d, so once a later start bag is strictly better
+        than an earlier one for some end bag, it stays better for all later end bags.
+
+        For every drone a queue of candidate start bags with the end bags where they are the best is kept; a new
+        candidate removes the candidates it beats and finds the end bag where it takes over with a binary search.
+        This takes O(n log n * d) cost evaluations. A later candidate only takes over where it is strictly better, so
+        ties are broken like in the reference implementation (the smallest start bag j wins). The final day has no
+        idle cost, which breaks the inequality, so the last row is computed over all feasible start bags.
+
+        The idle costs are filled in like in _dynamic_programming_vectorized. See cross_validate_dp_methods to check
+        the results against the exact dynamic programming.
+        """
+        # the inequality needs non-negative liters per bag; the window handles the other cases
+        if not self._window_applies():
+            self._dynamic_programming_window()
+            return
+
+        self._fill_idle_cost_vectorized()
+        if self.num_bags == 0:
+            return
+
+        # hoisted lookups for the cost function
+        values, offsets, first = self.idle_cost.values, self.idle_cost.offsets, self.idle_cost.first
+        usage_prefix = self.usage_prefix_sums
+        optimal_cost = self.optimal_cost
+        last_row = self.num_bags - 2
+
+        def cost(j: int, i: int, l: int) -> float:
+            if j < first[i]:
+                return np.inf
+            return optimal_cost[j, l] + values[offsets[i] + j - first[i]] + (usage_prefix[i + 1, l] - usage_prefix[j, l])
+
+        def beats(c: int, j: int, i: int, l: int) -> bool:
+            # c > j is better at end bag i; if both days are infeasible the later start bag is taken, which keeps
+            # this monotone in i (an infeasible day stays infeasible for later end bags)
+            new, old = cost(c, i, l), cost(j, i, l)
+            return new < old or new == old == np.inf
+
+        # per drone: the candidate start bags, the end bag from which they are the best, and the front of the queue
+        candidates = [[] for _ in range(self.num_drones)]
+        takeover = [[] for _ in range(self.num_drones)]
+        front = [0] * self.num_drones
+
+        best_start = np.empty(self.num_drones, dtype=np.int64)
+        best_cost = np.empty(self.num_drones)
+        for i in range(self.num_bags - 1):
+            for l in range(self.num_drones):
+                queue, starts = candidates[l], takeover[l]
+
+                # add start bag i as a candidate (a start bag that cannot be reached never becomes the best)
+                if optimal_cost[i, l] < np.inf:
+                    while len(queue) > front[l] and beats(i, queue[-1], max(starts[-1], i), l):
+                        queue.pop()
+                        starts.pop()
+                    if len(queue) == front[l]:
+                        queue.append(i)
+                        starts.append(i)
+                    else:
+                        # binary search for the first end bag where start bag i beats the last candidate
+                        lo, hi = max(starts[-1], i) + 1, last_row + 1
+                        while lo < hi:
+                            mid = (lo + hi) // 2
+                            if beats(i, queue[-1], mid, l):
+                                hi = mid
+                            else:
+                                lo = mid + 1
+                        if lo <= last_row:
+                            queue.append(i)
+                            starts.append(lo)
+
+                # the best start bag for end bag i is at the front of the queue
+                while len(queue) > front[l] + 1 and starts[front[l] + 1] <= i:
+                    front[l] += 1
+                if len(queue) > front[l]:
+                    best_start[l] = queue[front[l]]
+                    best_cost[l] = cost(best_start[l], i, l)
+                else:
+                    best_start[l], best_cost[l] = -1, np.inf
+
+            self._store_optimal_cost_row(i, best_start, best_cost)
+
+        # the final day has no idle cost, so the last row considers all feasible start bags
+        self._fill_optimal_cost_row(self.num_bags - 1, first[self.num_bags - 1])
+
+    def _dynamic_programming_kernel(self):
+        """
+        Runs the loops of the reference implementation in _dp_kernel, on plain lists instead of through the methods
+        above, and stores its results. The idle costs are filled in like in _dynamic_programming_vectorized.
+        """
+        # the kernel reads the usage costs from the prefix sums; the reference handles the other cases
+        if self.usage_prefix_sums is None or len(self.usage_cost) < self.num_bags:
+            self._dynamic_programming_reference()
+            return
+
+        self._fill_idle_cost_vectorized()
+        optimal_cost, backpointers = _dp_kernel(self.liter_prefix_sums.tolist(), self.usage_prefix_sums.tolist(),
+                                                self.liter_budget_per_day, self.num_drones)
+        # the kernel returns plain lists, which lose the number of drones when there are no bags
+        self.optimal_cost[1:] = np.asarray(optimal_cost).reshape(-1, self.num_drones)
+        if isinstance(self.backtrace_memory, BacktraceArray):
+            self.backtrace_memory.array[:] = np.asarray(backpointers).reshape(-1, self.num_drones)
+        else:
+            for i, row in enumerate(backpointers):
+                for k, min_cost_idx in enumerate(row):
+                    self.backtrace_memory[(i, k)] = min_cost_idx
+
+    def _column_idle_costs(self, i: int, first_start: int) -> np.ndarray:
+        """
+        Returns the idle costs idle_cost[j, i] of the days j..i for the start bags j = first_start, ..., i.
+        """
+        prefix = self.liter_prefix_sums
+        return _day_idle_costs(self.liter_budget_per_day, prefix[i + 1] - prefix[first_start:i + 1],
+                               i == self.num_bags - 1)
+
+    def _lean_row(self, i: int, first: np.ndarray, rows: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        Computes optimal_cost[i+1, :] and the backpointers of end bag i like _fill_optimal_cost_row, without storing
+        the idle costs. rows is a ring buffer: optimal_cost[r] is kept in rows[r % len(rows)].
+        """
+        starts = np.arange(first[i], i + 1)
+        candidates = rows[starts % len(rows)] + self._column_idle_costs(i, first[i])[:, None] \
+            + (self.usage_prefix_sums[i + 1, :] - self.usage_prefix_sums[starts, :])
+        return self._running_min_over_drones(*self._best_start_per_drone(candidates, first[i]))
+
+    def _dynamic_programming_lean(self, checkpoint: bool):
+        """
+        Memory-lean dynamic programming for the "none" and "checkpoint" backtrace modes. Only the rows of optimal_cost
+        in the sliding window (at most w + 1 rows for windows of at most w bags) are kept in a ring buffer, the idle
+        costs are not stored. Besides the prefix sums, the windows and the ring buffer take O(w * d) memory.
+
+        With checkpoint, a copy of the ring buffer is kept every s = sqrt(n * w) rows, from which backtrace_solution
+        recomputes the backpointers one segment of s rows at a time (like the checkpointing of Hirschberg's
+        algorithm), so the backtrace takes O(sqrt(n * w) * d) extra memory instead of O(n * d).
+        """
+        first = self.feasible_start_bags()
+        width = int(np.max(np.arange(1, self.num_bags + 1) - first, initial=0))
+        rows = np.zeros((width + 1, self.num_drones))
+        segment_size = max(1, math.ceil(math.sqrt(self.num_bags * (width + 1))))
+
+        checkpoints = {}
+        for i in range(self.num_bags):
+            if checkpoint and i % segment_size == 0:
+                checkpoints[i] = rows.copy()
+            rows[(i + 1) % len(rows)] = self._lean_row(i, first, rows)[0]
+
+        self.optimal_cost = rows[[self.num_bags % len(rows)]].copy()
+        self.backtrace_memory = CheckpointedBacktrace(self, first, checkpoints, segment_size) if checkpoint else None
+
+    def add_bags(self, bags: typing.List[int], bag_locations: typing.List[typing.Tuple[float, float]],
+                 usage_cost: np.ndarray):
+        """
+        Adds water bags that show up while the operation is running and updates the solution. Row i of optimal_cost
+        only depends on the rows before it, so only the rows of the new bags are computed, plus the row of the
+        previous last bag (its day is no longer the final day, so it gets an idle cost again). lowest_cost and
+        backtrace_solution give the solution for all bags added so far afterwards. The arrays grow into buffers
+        that double in size, so an update costs O(new rows * w * d) for windows of at most w bags and d drones.
+        The travel costs of the new bags are computed if those of the existing bags have been filled in.
+
+        If dynamic_programming has not been called yet, all rows are computed.
+
+        :param bags: list of the contents of the new water bags in liters
+        :param bag_locations: list of the locations of the new water bags
+        :param usage_cost: a 2D array with the usage costs usage_cost[i,k] of the new bags for all drones
+        """
+        if self.usage_prefix_sums is None:
+            raise ValueError("add_bags needs the usage costs of the existing bags (usage_cost is None)")
+        usage_cost = np.asarray(usage_cost).reshape(-1, self.num_drones)
+        if not len(bags) == len(bag_locations) == len(usage_cost):
+            raise ValueError(f"got {len(bags)} bags, {len(bag_locations)} bag locations and {len(usage_cost)} rows "
+                             f"of usage costs")
+
+        old_num_bags = self.num_bags
+        if len(self.optimal_cost) != old_num_bags + 1 or not isinstance(self.backtrace_memory, (dict, BacktraceArray)):
+            # solved with a memory-lean backtrace mode: the rows are not kept, so all rows are computed again
+            self.optimal_cost = np.zeros((old_num_bags + 1, self.num_drones))
+            self.backtrace_memory = dict()
+            self.solved_bags = 0
+        if self._refresh_idle_cost_band():
+            # liter_budget_per_day changed since the rows were computed, so they are computed again
+            self.solved_bags = 0
+        liters = np.asarray(bags, dtype=float)
+        if len(self.travel_costs_in_liters) >= old_num_bags:
+            del self.travel_costs_in_liters[old_num_bags:]
+            travel = self.compute_travel_costs_in_liters(bag_locations)
+            self.travel_costs_in_liters.extend(travel.tolist())
+            liters = liters + travel
+
+        # the lists passed to the constructor are copied once, after which they are extended in place
+        for name, new_items in (("bags", bags), ("bag_locations", bag_locations)):
+            if self._buffers.get(name) is not getattr(self, name):
+                self._buffers[name] = list(getattr(self, name))
+                setattr(self, name, self._buffers[name])
+            getattr(self, name).extend(new_items)
+        self.num_bags += len(bags)
+        self.usage_cost, self._buffers["usage_cost"] = _append_rows(
+            self.usage_cost, self._buffers.get("usage_cost"), usage_cost)
+        self.usage_prefix_sums, self._buffers["usage_prefix_sums"] = _append_rows(
+            self.usage_prefix_sums, self._buffers.get("usage_prefix_sums"),
+            self.usage_prefix_sums[-1] + np.cumsum(usage_cost, axis=0))
+        self.liter_prefix_sums, self._buffers["liter_prefix_sums"] = _append_rows(
+            self.liter_prefix_sums, self._buffers.get("liter_prefix_sums"),
+            self.liter_prefix_sums[-1] + np.cumsum(liters))
+        self.optimal_cost, self._buffers["optimal_cost"] = _append_rows(
+            self.optimal_cost, self._buffers.get("optimal_cost"), np.zeros((len(bags), self.num_drones)))
+        if isinstance(self.backtrace_memory, BacktraceArray):
+            self.backtrace_memory.extend(len(bags))
+
+        # the sliding window needs non-negative liters and usage costs for all bags; otherwise solve from scratch
+        if not self._window_applies():
+            self.dynamic_programming(method="window",
+                                     backtrace="array" if isinstance(self.backtrace_memory, BacktraceArray) else "dict")
+            return
+
+        first_start = self.idle_cost.first[old_num_bags - 1] if old_num_bags else 0
+        self.idle_cost.extend(self.feasible_start_bags(old_num_bags, first_start))
+        self._idle_cost_band_source = (self.liter_budget_per_day, self.liter_prefix_sums)
+        self._fill_window_rows(max(min(self.solved_bags, old_num_bags) - 1, 0))
+        self.solved_bags = self.num_bags
+
     def lowest_cost(self) -> float:
         """
         Returns the lowest cost at which we can empty the water bags to extinguish to forest fire. Inside of this function,
@@ -255,16 +950,26 @@ class DroneExtinguisher:
         :return: A tuple (leftmost indices, drone list) as described above
         """
 
+        if self.backtrace_memory is None:
+            raise ValueError("no backpointers were kept, solve with a backtrace mode other than \"none\"")
+        return self._backtrace(self.backtrace_memory, self.num_bags, self.num_drones)
+
+    @staticmethod
+    def _backtrace(backtrace_memory, num_bags: int, num_drones: int) -> typing.Tuple[typing.List[int], typing.List[int]]:
+        """
+        The backtrace of backtrace_solution for any backpointers backtrace_memory[(i, k)] (also used by
+        solve_scenarios).
+        """
         # Initialize the lists
         leftmost_indices = []
-        drone_list = [-1] * self.num_bags
+        drone_list = [-1] * num_bags
 
         # Start backtracking from the end
-        i, k = self.num_bags, self.num_drones - 1
+        i, k = num_bags, num_drones - 1
 
         while i > 0 and k >= 0:
             # Retrieve the index of the bag with minimum cost
-            min_cost_idx = self.backtrace_memory[(i - 1, k)]
+            min_cost_idx = backtrace_memory[(i - 1, k)]
 
             # Fill in the drone list
             for bag_idx in range(min_cost_idx, i):
@@ -284,3 +989,283 @@ class DroneExtinguisher:
         return leftmost_indices, drone_list
 
         # TODO
+
+
+def _dp_kernel(liter_prefix_sums: typing.List[float], usage_prefix_sums: typing.List[typing.List[float]],
+               liter_budget_per_day: float,
+               num_drones: int) -> typing.Tuple[typing.List[typing.List[float]], typing.List[typing.List[int]]]:
+    """
+    The dynamic programming of DroneExtinguisher._dynamic_programming_reference as one function on plain lists: no
+    method calls or attribute lookups per cell, and the idle and usage costs are inlined as prefix sum differences.
+    Per end bag i and drone l the best start bag j is found first, after which the running minimum over the drones
+    gives the same (j, l) as the reference loops (the smallest j wins ties). The start bags are scanned from the first
+    one that fits in the budget, which moves forward as long as the liters per bag are not negative.
+
+    :param liter_prefix_sums: DroneExtinguisher.liter_prefix_sums as a list
+    :param usage_prefix_sums: DroneExtinguisher.usage_prefix_sums as a list of rows
+    :param liter_budget_per_day: the maximum amount of work (in liters) per day
+    :param num_drones: the number of drones
+
+    Returns:
+      The rows optimal_cost[1:] and the backpointers backtrace[i][k] as lists
+    """
+    inf = math.inf
+    num_bags = len(liter_prefix_sums) - 1
+    non_decreasing = all(a <= b for a, b in zip(liter_prefix_sums, liter_prefix_sums[1:]))
+    drones = range(num_drones)
+
+    optimal_cost = [[0.0] * num_drones]
+    backpointers = []
+    first = 0
+    for i in range(num_bags):
+        end_liters = liter_prefix_sums[i + 1]
+        end_usage = usage_prefix_sums[i + 1]
+        final_day = i == num_bags - 1
+        if non_decreasing:
+            while first <= i and liter_budget_per_day - (end_liters - liter_prefix_sums[first]) < 0:
+                first += 1
+
+        best_cost = [inf] * num_drones
+        best_start = [-1] * num_drones
+        for j in range(first if non_decreasing else 0, i + 1):
+            idle_time = liter_budget_per_day - (end_liters - liter_prefix_sums[j])
+            # the rules of compute_idle_cost
+            if final_day and idle_time > 0:
+                idle_cost = 0
+            elif idle_time < 0:
+                continue
+            else:
+                idle_cost = idle_time ** 3
+
+            start_cost = optimal_cost[j]
+            start_usage = usage_prefix_sums[j]
+            for l in drones:
+                current_cost = start_cost[l] + idle_cost + (end_usage[l] - start_usage[l])
+                if current_cost < best_cost[l]:
+                    best_cost[l] = current_cost
+                    best_start[l] = j
+
+        # running minimum over the drones l <= k
+        cost_row = [0.0] * num_drones
+        start_row = [0] * num_drones
+        min_cost = inf
+        min_cost_idx = -1
+        for k in drones:
+            if best_cost[k] < min_cost or (best_cost[k] == min_cost and best_start[k] < min_cost_idx):
+                min_cost = best_cost[k]
+                min_cost_idx = best_start[k]
+            cost_row[k] = min_cost
+            start_row[k] = min_cost_idx
+        optimal_cost.append(cost_row)
+        backpointers.append(start_row)
+
+    return optimal_cost[1:], backpointers
+
+
+# the dynamic programming implementations that can be passed to DroneExtinguisher.dynamic_programming
+DP_METHODS = ("reference", "vectorized", "window", "monotone", "kernel")
+BACKTRACE_MODES = ("dict", "array", "none", "checkpoint")
+
+
+def cross_validate_dp_methods(methods: typing.Sequence[str] = ("monotone",), num_instances: int = 100,
+                              max_bags: int = 40, max_drones: int = 4, seed: int = 0) -> typing.List[typing.Dict]:
+    """
+    Checker for the optimised dynamic programming methods: solves random instances with every method and with the
+    exact reference implementation and compares optimal_cost and the backtraced solution.
+
+    :param methods: the methods (see DP_METHODS) to check
+    :param num_instances: the number of random instances
+    :param max_bags: the maximum number of bags of an instance
+    :param max_drones: the maximum number of drones of an instance
+    :param seed: the seed of the random generator
+
+    Returns:
+      A list with a dictionary (instance seed, method, number of bags and drones) for every mismatch
+    """
+    rng = np.random.default_rng(seed)
+    mismatches = []
+    for _ in range(num_instances):
+        instance_seed = int(rng.integers(2 ** 32))
+        num_bags, num_drones = int(rng.integers(1, max_bags + 1)), int(rng.integers(1, max_drones + 1))
+
+        def make_instance() -> DroneExtinguisher:
+            instance_rng = np.random.default_rng(instance_seed)
+            de = DroneExtinguisher(forest_location=(0, 0), bags=instance_rng.integers(1, 40, size=num_bags).tolist(),
+                                   bag_locations=[tuple(location) for location in
+                                                  instance_rng.uniform(0, 10, size=(num_bags, 2))],
+                                   liter_cost_per_km=1, liter_budget_per_day=int(instance_rng.integers(40, 150)),
+                                   usage_cost=instance_rng.integers(0, 30, size=(num_bags, num_drones)))
+            de.fill_travel_costs_in_liters()
+            return de
+
+        reference = make_instance()
+        reference.dynamic_programming(method="reference")
+        for method in methods:
+            de = make_instance()
+            de.dynamic_programming(method=method)
+            if not np.array_equal(de.optimal_cost, reference.optimal_cost) \
+                    or de.backtrace_solution() != reference.backtrace_solution():
+                mismatches.append({"seed": instance_seed, "method": method, "num_bags": num_bags,
+                                   "num_drones": num_drones})
+    return mismatches
+
+
+# the shared data of solve_scenarios in a worker process (set by _init_scenario_worker)
+_SCENARIO_DATA = None
+
+
+def _init_scenario_worker(data: typing.Dict):
+    global _SCENARIO_DATA
+    _SCENARIO_DATA = data
+
+
+def _solve_budget_group(liter_prefix_sums: np.ndarray, usage_prefix_sums: np.ndarray, budgets: np.ndarray,
+                        backtrace: bool) -> typing.Tuple[np.ndarray, typing.Optional[np.ndarray]]:
+    """
+    Solves scenarios that only differ in liter_budget_per_day at once: optimal_cost gets a leading budget axis and
+    every end bag i is computed for all budgets with one NumPy expression over the start bags that fit in the
+    largest budget. The candidates, argmin and running minimum over the drones are the same as in
+    _fill_optimal_cost_row, so the results are identical to solving every scenario on its own.
+
+    Returns:
+      The lowest cost per budget and, if backtrace, the (budget, bag, drone) array of backpointers
+    """
+    num_bags, num_drones = len(liter_prefix_sums) - 1, usage_prefix_sums.shape[1]
+    budgets = np.asarray(budgets)
+    optimal_cost = np.zeros((len(budgets), num_bags + 1, num_drones))
+    backpointers = np.empty((len(budgets), num_bags, num_drones), dtype=BacktraceArray._dtype(num_bags)) \
+        if backtrace else None
+
+    # the start bags that can fit in the largest budget (one extra start bag guards against rounding, the infeasible
+    # days get an infinite idle cost anyway); with negative liters the days are not contiguous, so use all start bags
+    if np.any(np.diff(liter_prefix_sums) < 0):
+        first = np.zeros(num_bags, dtype=np.int64)
+    else:
+        first = np.searchsorted(liter_prefix_sums, liter_prefix_sums[1:] - budgets.max()) - 1
+        first = np.clip(first, 0, np.arange(1, num_bags + 1))
+
+    drones = np.arange(num_drones)
+    for i in range(num_bags):
+        starts = np.arange(first[i], i + 1)
+        idle_cost = _day_idle_costs(budgets[:, None], (liter_prefix_sums[i + 1] - liter_prefix_sums[starts])[None, :],
+                                    i == num_bags - 1)
+
+        candidates = optimal_cost[:, starts, :] + idle_cost[:, :, None] \
+            + (usage_prefix_sums[i + 1, :] - usage_prefix_sums[starts, :])[None, :, :]
+        if len(starts):
+            best = np.argmin(candidates, axis=1)
+            best_cost = candidates[np.arange(len(budgets))[:, None], best, drones[None, :]]
+            best_start = first[i] + best
+        else:
+            best_cost = np.full((len(budgets), num_drones), np.inf)
+            best_start = np.full((len(budgets), num_drones), -1)
+
+        # running minimum over the drones l <= k for all budgets
+        min_cost = np.full(len(budgets), np.inf)
+        min_cost_idx = np.full(len(budgets), -1)
+        for k in range(num_drones):
+            better = (best_cost[:, k] < min_cost) | ((best_cost[:, k] == min_cost) & (best_start[:, k] < min_cost_idx))
+            min_cost = np.where(better, best_cost[:, k], min_cost)
+            min_cost_idx = np.where(better, best_start[:, k], min_cost_idx)
+            optimal_cost[:, i + 1, k] = min_cost
+            if backtrace:
+                backpointers[:, i, k] = min_cost_idx
+
+    return optimal_cost[:, -1, -1], backpointers
+
+
+def _solve_scenario_task(task: typing.Tuple, data: typing.Dict = None) -> typing.List[typing.Dict]:
+    travel_key, usage_key, budgets, backtrace = task
+    data = data if data is not None else _SCENARIO_DATA
+    usage_prefix_sums = data["usage_prefix_sums"][usage_key]
+    lowest_costs, backpointers = _solve_budget_group(data["liter_prefix_sums"][travel_key], usage_prefix_sums,
+                                                     budgets, backtrace)
+
+    results = []
+    for b, lowest_cost in enumerate(lowest_costs):
+        solution = None
+        if backtrace:
+            memory = BacktraceArray(0, usage_prefix_sums.shape[1])
+            memory.array = backpointers[b]
+            solution = DroneExtinguisher._backtrace(memory, len(backpointers[b]), usage_prefix_sums.shape[1])
+        results.append({"lowest_cost": float(lowest_cost), "backtrace": solution})
+    return results
+
+
+def solve_scenarios(forest_location: typing.Tuple[float, float], bags: typing.List[int],
+                    bag_locations: typing.List[typing.Tuple[float, float]], scenarios: typing.List[typing.Dict],
+                    usage_cost: np.ndarray = None, backtrace: bool = False, processes: int = None,
+                    budget_chunk: int = 64) -> typing.List[typing.Dict]:
+    """
+    Solves many what-if scenarios for the same bags and bag locations. Every scenario is a dictionary with
+    "liter_budget_per_day", "liter_cost_per_km" and optionally "usage_cost" (a different drone fleet; by default the
+    usage_cost argument). The distances to the forest are computed once, the travel costs and prefix sums once per
+    liter_cost_per_km and the usage prefix sums once per fleet. Scenarios that only differ in their budget are solved
+    together, vectorised over the budgets (see _solve_budget_group), in chunks of budget_chunk budgets that are
+    distributed over a process pool.
+
+    :param forest_location: the location (x,y) of the forest
+    :param bags: list of the contents of the water bags in liters
+    :param bag_locations: list of the locations of the water bags
+    :param scenarios: the scenarios, see above
+    :param usage_cost: the usage costs of the scenarios without their own "usage_cost"
+    :param backtrace: whether to return the backtrace_solution of every scenario as well
+    :param processes: the number of worker processes (None for one per core); 0 or 1 solves in this process
+    :param budget_chunk: the maximum number of budgets that is solved at once (bounds the memory per task)
+
+    Returns:
+      A list with, for every scenario, a dictionary with its "lowest_cost" and "backtrace" (None unless backtrace)
+    """
+    allowed_keys = {"liter_budget_per_day", "liter_cost_per_km", "usage_cost"}
+    if len(bags) != len(bag_locations):
+        raise ValueError(f"got {len(bags)} bags and {len(bag_locations)} bag locations")
+    distances = DroneExtinguisher.compute_distances_to_forest(forest_location, bag_locations)
+    liters = np.asarray(bags, dtype=float)
+
+    data = {"liter_prefix_sums": {}, "usage_prefix_sums": {}}
+    fleets = {}
+    groups = {}
+    for index, scenario in enumerate(scenarios):
+        if not {"liter_budget_per_day", "liter_cost_per_km"} <= set(scenario) <= allowed_keys:
+            raise ValueError(f"scenario {index} has keys {sorted(scenario)}, expected liter_budget_per_day, "
+                             f"liter_cost_per_km and optionally usage_cost")
+        fleet = scenario.get("usage_cost", usage_cost)
+        if fleet is None:
+            raise ValueError(f"scenario {index} has no usage costs")
+        if len(fleet) != len(bags):
+            raise ValueError(f"the usage costs of scenario {index} have {len(fleet)} rows, expected one per bag "
+                             f"({len(bags)})")
+
+        travel_key = scenario["liter_cost_per_km"]
+        if travel_key not in data["liter_prefix_sums"]:
+            travel = np.ceil(distances * travel_key * 2).astype(np.int64)
+            data["liter_prefix_sums"][travel_key] = np.concatenate(([0.0], np.cumsum(liters + travel)))
+        usage_key = fleets.setdefault(id(fleet), len(fleets))
+        if usage_key not in data["usage_prefix_sums"]:
+            fleet = np.asarray(fleet)
+            usage_prefix_sums = np.zeros((len(fleet) + 1, fleet.shape[1]))
+            np.cumsum(fleet, axis=0, out=usage_prefix_sums[1:])
+            data["usage_prefix_sums"][usage_key] = usage_prefix_sums
+
+        groups.setdefault((travel_key, usage_key), []).append(index)
+
+    tasks, task_indices = [], []
+    for (travel_key, usage_key), indices in groups.items():
+        for start in range(0, len(indices), budget_chunk):
+            chunk = indices[start:start + budget_chunk]
+            budgets = np.array([scenarios[index]["liter_budget_per_day"] for index in chunk])
+            tasks.append((travel_key, usage_key, budgets, backtrace))
+            task_indices.append(chunk)
+
+    if processes is not None and processes <= 1:
+        task_results = [_solve_scenario_task(task, data) for task in tasks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(processes, initializer=_init_scenario_worker,
+                                                    initargs=(data,)) as pool:
+            task_results = list(pool.map(_solve_scenario_task, tasks))
+
+    results = [None] * len(scenarios)
+    for indices, chunk_results in zip(task_indices, task_results):
+        for index, result in zip(indices, chunk_results):
+            results[index] = result
+    return results
@@ -2,7 +2,8 @@ import typing
 import unittest
 import numpy as np
 
-from dynprog import DroneExtinguisher
+import benchmark
+from dynprog import DroneExtinguisher, DP_METHODS, BACKTRACE_MODES, cross_validate_dp_methods, solve_scenarios
 
 
 class TestDroneExtinguisher(unittest.TestCase):
@@ -84,3 +85,208 @@ class TestDroneExtinguisher(unittest.TestCase):
 
         # Test case where i or j is out of range
         self.assertEqual(de.compute_sequence_idle_time_in_liters(5,6), np.inf)
+
+    def test_sequence_costs_from_prefix_sums(self):
+        rng = np.random.default_rng(0)
+        bags = rng.integers(1, 50, size=12).tolist()
+        bag_locations = [tuple(location) for location in rng.uniform(0, 10, size=(12, 2))]
+        usage_cost = rng.integers(0, 20, size=(12, 3))
+
+        de = DroneExtinguisher(forest_location=(0, 0), bags=bags, bag_locations=bag_locations,
+                               liter_cost_per_km=1.5, liter_budget_per_day=200, usage_cost=usage_cost)
+        de.fill_travel_costs_in_liters()
+
+        for i in range(12):
+            for j in range(i, 12):
+                expected_idle = 200 - (sum(bags[i:j + 1]) + sum(de.travel_costs_in_liters[i:j + 1]))
+                self.assertEqual(de.compute_sequence_idle_time_in_liters(i, j), expected_idle)
+                for k in range(3):
+                    self.assertEqual(de.compute_sequence_usage_cost(i, j, k), usage_cost[i:j + 1, k].sum())
+
+    def make_random_instance(self, rng, num_bags, num_drones, budget=100):
+        bags = rng.integers(1, 40, size=num_bags).tolist()
+        bag_locations = [tuple(location) for location in rng.uniform(0, 10, size=(num_bags, 2))]
+        usage_cost = rng.integers(0, 30, size=(num_bags, num_drones))
+        de = DroneExtinguisher(forest_location=(0, 0), bags=bags, bag_locations=bag_locations,
+                               liter_cost_per_km=1, liter_budget_per_day=budget, usage_cost=usage_cost)
+        de.fill_travel_costs_in_liters()
+        return de
+
+    def test_dynamic_programming_methods_match_reference(self):
+        rng = np.random.default_rng(1)
+        for seed in range(20):
+            num_bags, num_drones = rng.integers(1, 12), rng.integers(1, 4)
+            budget = int(rng.integers(40, 150))
+            reference = self.make_random_instance(np.random.default_rng(seed), num_bags, num_drones, budget)
+            reference.dynamic_programming()
+
+            for method in DP_METHODS:
+                de = self.make_random_instance(np.random.default_rng(seed), num_bags, num_drones, budget)
+                de.dynamic_programming(method=method)
+                np.testing.assert_array_equal(de.optimal_cost, reference.optimal_cost)
+                self.assertEqual(de.backtrace_solution(), reference.backtrace_solution())
+
+    def test_dynamic_programming_methods_without_bags(self):
+        reference = DroneExtinguisher((0, 0), [], [], 1, 100, np.zeros((0, 2)))
+        reference.fill_travel_costs_in_liters()
+        reference.dynamic_programming()
+        for method in DP_METHODS:
+            de = DroneExtinguisher((0, 0), [], [], 1, 100, np.zeros((0, 2)))
+            de.fill_travel_costs_in_liters()
+            de.dynamic_programming(method=method)
+            np.testing.assert_array_equal(de.optimal_cost, reference.optimal_cost)
+            self.assertEqual(de.backtrace_solution(), reference.backtrace_solution())
+
+    def test_banded_idle_cost(self):
+        rng = np.random.default_rng(2)
+        de = self.make_random_instance(rng, 60, 2, budget=80)
+        # only the days that fit in the budget are stored
+        self.assertLess(de.idle_cost.values.size, de.num_bags * (de.num_bags + 1) // 2)
+
+        de.dynamic_programming(method="vectorized")
+        for i in range(de.num_bags):
+            for j in range(de.num_bags):
+                if i > j:
+                    self.assertEqual(de.idle_cost[i, j], -1)
+                else:
+                    idle_time = de.compute_sequence_idle_time_in_liters(i, j)
+                    self.assertEqual(de.idle_cost[i, j], de.compute_idle_cost(i, j, idle_time))
+        self.assertEqual(de.idle_cost[-1, -1], de.idle_cost[de.num_bags - 1, de.num_bags - 1])
+        with self.assertRaises(IndexError):
+            de.idle_cost[0, de.num_bags]
+
+    def test_add_bags_matches_dynamic_programming(self):
+        rng = np.random.default_rng(3)
+        for seed in range(10):
+            num_bags, num_drones = int(rng.integers(2, 15)), int(rng.integers(1, 4))
+            complete = self.make_random_instance(np.random.default_rng(seed), num_bags, num_drones)
+
+            # start with the first bag and add the others in chunks, checking the solution after every append
+            de = DroneExtinguisher(forest_location=(0, 0), bags=complete.bags[:1],
+                                   bag_locations=complete.bag_locations[:1], liter_cost_per_km=1,
+                                   liter_budget_per_day=100, usage_cost=complete.usage_cost[:1])
+            de.fill_travel_costs_in_liters()
+            de.dynamic_programming()
+            n = 1
+            while n < num_bags:
+                m = min(num_bags, n + int(rng.integers(1, 4)))
+                de.add_bags(complete.bags[n:m], complete.bag_locations[n:m], complete.usage_cost[n:m])
+                n = m
+
+                expected = DroneExtinguisher(forest_location=(0, 0), bags=complete.bags[:n],
+                                             bag_locations=complete.bag_locations[:n], liter_cost_per_km=1,
+                                             liter_budget_per_day=100, usage_cost=complete.usage_cost[:n])
+                expected.fill_travel_costs_in_liters()
+                expected.dynamic_programming()
+                np.testing.assert_array_equal(de.optimal_cost, expected.optimal_cost)
+                self.assertEqual(de.backtrace_solution(), expected.backtrace_solution())
+            self.assertEqual(de.travel_costs_in_liters, complete.travel_costs_in_liters)
+
+    def test_travel_costs_match_per_bag_rounding(self):
+        rng = np.random.default_rng(4)
+        bag_locations = [tuple(location) for location in rng.uniform(-50, 50, size=(500, 2))]
+        bag_locations += [(3, 4), (6, 8), (0, 0), (-3, -4)]
+        de = DroneExtinguisher(forest_location=(1.5, -2.25), bags=[1] * len(bag_locations),
+                               bag_locations=bag_locations, liter_cost_per_km=0.7,
+                               liter_budget_per_day=100, usage_cost=None)
+        de.fill_travel_costs_in_liters()
+
+        expected = [np.ceil(de.compute_euclidean_distance(de.forest_location, location) * 0.7 * 2)
+                    for location in bag_locations]
+        self.assertEqual(de.travel_costs_in_liters, expected)
+        self.assertEqual(de.compute_travel_costs_in_liters(bag_locations).dtype, np.int64)
+
+    def test_monotone_dynamic_programming_cross_validation(self):
+        self.assertEqual(cross_validate_dp_methods(("monotone",), num_instances=50, max_bags=50), [])
+
+    def test_backtrace_modes(self):
+        rng = np.random.default_rng(5)
+        for seed in range(10):
+            num_bags, num_drones = int(rng.integers(1, 40)), int(rng.integers(1, 4))
+            reference = self.make_random_instance(np.random.default_rng(seed), num_bags, num_drones)
+            reference.dynamic_programming()
+
+            for backtrace in BACKTRACE_MODES:
+                de = self.make_random_instance(np.random.default_rng(seed), num_bags, num_drones)
+                de.dynamic_programming(method="window", backtrace=backtrace)
+                self.assertEqual(de.optimal_cost[-1][-1], reference.optimal_cost[-1][-1])
+                if backtrace == "none":
+                    self.assertIsNone(de.backtrace_memory)
+                    with self.assertRaises(ValueError):
+                        de.backtrace_solution()
+                else:
+                    self.assertEqual(de.backtrace_solution(), reference.backtrace_solution())
+
+        de = self.make_random_instance(rng, 20, 2)
+        de.dynamic_programming(backtrace="array")
+        self.assertEqual(de.backtrace_memory.array.dtype, np.int16)
+
+        # the checkpoints take sub-linear memory on a large instance with narrow windows
+        de = self.make_random_instance(rng, 5000, 2, budget=60)
+        de.dynamic_programming(backtrace="checkpoint")
+        self.assertEqual(len(de.optimal_cost), 1)
+        self.assertLess(de.backtrace_memory.nbytes, de.num_bags * de.num_drones * 8 // 4)
+        de.backtrace_solution()
+        self.assertLess(de.backtrace_memory.nbytes, de.num_bags * de.num_drones * 8 // 4)
+
+    def test_solve_scenarios_matches_individual_solutions(self):
+        rng = np.random.default_rng(6)
+        bags = rng.integers(1, 40, size=25).tolist()
+        bag_locations = [tuple(location) for location in rng.uniform(0, 10, size=(25, 2))]
+        fleets = [rng.integers(0, 30, size=(25, 2)), rng.integers(0, 30, size=(25, 3))]
+        scenarios = [{"liter_budget_per_day": budget, "liter_cost_per_km": cost_per_km}
+                     for budget in (45, 60, 100, 150) for cost_per_km in (0.5, 1)]
+        scenarios.append({"liter_budget_per_day": 80, "liter_cost_per_km": 1, "usage_cost": fleets[1]})
+
+        for processes in (1, 2):
+            results = solve_scenarios((0, 0), bags, bag_locations, scenarios, usage_cost=fleets[0], backtrace=True,
+                                      processes=processes, budget_chunk=3)
+            for scenario, result in zip(scenarios, results):
+                de = DroneExtinguisher(forest_location=(0, 0), bags=bags, bag_locations=bag_locations,
+                                       liter_cost_per_km=scenario["liter_cost_per_km"],
+                                       liter_budget_per_day=scenario["liter_budget_per_day"],
+                                       usage_cost=scenario.get("usage_cost", fleets[0]))
+                de.fill_travel_costs_in_liters()
+                de.dynamic_programming()
+                self.assertEqual(result["lowest_cost"], de.optimal_cost[-1][-1])
+                self.assertEqual(result["backtrace"], de.backtrace_solution())
+
+        with self.assertRaises(ValueError):
+            solve_scenarios((0, 0), bags, bag_locations, [{"liter_budget_per_day": 50}], usage_cost=fleets[0])
+        with self.assertRaises(ValueError):
+            solve_scenarios((0, 0), bags, bag_locations, [{"liter_budget_per_day": 50, "liter_cost_per_km": 1}],
+                            usage_cost=fleets[0][:8])
+
+
+    def test_changing_the_budget_rebuilds_the_idle_cost_band(self):
+        for method in DP_METHODS:
+            de = self.make_random_instance(np.random.default_rng(7), 15, 2, budget=60)
+            de.liter_budget_per_day = 150
+            de.dynamic_programming(method=method)
+            expected = self.make_random_instance(np.random.default_rng(7), 15, 2, budget=150)
+            expected.dynamic_programming()
+            np.testing.assert_array_equal(de.optimal_cost, expected.optimal_cost)
+
+        # a solved instance whose budget changes before bags are added
+        complete = self.make_random_instance(np.random.default_rng(8), 15, 2, budget=150)
+        complete.dynamic_programming()
+        de = DroneExtinguisher(forest_location=(0, 0), bags=complete.bags[:10],
+                               bag_locations=complete.bag_locations[:10], liter_cost_per_km=1,
+                               liter_budget_per_day=60, usage_cost=complete.usage_cost[:10])
+        de.fill_travel_costs_in_liters()
+        de.dynamic_programming()
+        de.liter_budget_per_day = 150
+        de.add_bags(complete.bags[10:], complete.bag_locations[10:], complete.usage_cost[10:])
+        np.testing.assert_array_equal(de.optimal_cost, complete.optimal_cost)
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_run_benchmark(self):
+        results = benchmark.run_benchmark([20, 40], repeats=1, reference_max_bags=20)
+        self.assertEqual({row["method"] for row in results}, set(DP_METHODS))
+        self.assertEqual(len(results), 2 * len(DP_METHODS) - 1)
+        for size in (20, 40):
+            self.assertEqual(len({row["lowest_cost"] for row in results if row["num_bags"] == size}), 1)
+        self.assertEqual({row["method"] for row in benchmark.fit_growth_exponents(results)},
+                         set(DP_METHODS) - {"reference"})
+